@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from twobodyproblem import headless
+from twobodyproblem.batch import BatchWriter, load_batch
+from twobodyproblem.options import Options
+from twobodyproblem.values import FIELDS, Values
+
+SCENARIOS = [
+    # a slow satellite falling into a small body, which overshoots it between two steps
+    Values(central_radius=1e5, distance=1e7, sat_v0_z=-300),
+    Values(sat_v0_z=-2000),
+    Values(sat_v0_z=-6000),
+    Values()
+]
+
+
+@pytest.mark.parametrize("integrator", ["euler", "leapfrog", "yoshida4", "rk4", "dopri5"])
+def test_batch_matches_single_runs(tmp_path, integrator):
+    """A batch detects the same collisions at the same times as single runs"""
+    options = Options()
+    options.delta_t = 60
+    options.integrator = integrator
+    until = 86400
+    with BatchWriter(tmp_path / "in.npz") as writer:
+        writer.write({field: np.array([values.to_list()[i] for values in SCENARIOS])
+                      for i, field in enumerate(FIELDS)})
+    headless.run_batch(tmp_path / "in.npz", tmp_path / "out.npz", options, until,
+                       progress=False)
+    table = load_batch(tmp_path / "out.npz")
+    for i, values in enumerate(SCENARIOS):
+        result, _ = headless.run_one(values, options, until)
+        assert bool(table["collided"][i]) == result["collided"]
+        if result["collided"]:
+            assert table["collision_time"][i] == pytest.approx(result["t"], rel=1e-9)
+            assert table["min_distance"][i] == pytest.approx(
+                values.central.radius + values.sat.radius, rel=1e-6)
+        distance = np.linalg.norm(result["pos"][1] - result["pos"][0])
+        assert table["distance_final"][i] == pytest.approx(distance, rel=1e-9)
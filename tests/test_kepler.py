@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from twobodyproblem.engine import Engine
+from twobodyproblem.kepler import KeplerPropagator
+from twobodyproblem.values import Values
+
+
+@pytest.mark.parametrize("sat_v0_z", [-10401.5, -10500, -15000, -20000])
+def test_hyperbolic_matches_dopri5(sat_v0_z):
+    """Open orbits from e≈1.0001 to e≈6.4 agree with dopri5 far from the periapsis"""
+    values = Values(sat_v0_z=sat_v0_z)
+    propagator = KeplerPropagator.from_values(values)
+    assert propagator.elements()["eccentricity"] > 1
+    times = np.array([1e3, 1e5, 1e6, 1e7])
+    pos, _ = propagator.state(times)
+    engine = Engine.from_values(values, integrator="dopri5", rtol=1e-12, atol=1e-8)
+    previous = 0
+    for t, expected in zip(times, pos):
+        engine.run(1, t - previous, collision_detection=False)
+        previous = t
+        distance = np.linalg.norm(engine.pos[1] - engine.pos[0])
+        assert np.abs(expected - engine.pos).max() < 1e-7 * distance
+
+
+def test_not_converged_raises():
+    """The iteration raises instead of returning an unconverged state"""
+    propagator = KeplerPropagator.from_values(Values(sat_v0_z=-20000))
+    with pytest.raises(FloatingPointError):
+        propagator.universal_anomaly(np.array([1e7]), max_iter=1)
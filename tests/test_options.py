@@ -0,0 +1,10 @@
+from twobodyproblem.constants import ADAPTIVE, FORCE_NAMES, INTEGRATOR_NAMES
+from twobodyproblem.forces import FORCES
+from twobodyproblem.integrators import INTEGRATORS
+
+
+def test_names_match_registries():
+    """The names the options are checked against are those of the registries"""
+    assert INTEGRATOR_NAMES == tuple(INTEGRATORS)
+    assert FORCE_NAMES == tuple(FORCES)
+    assert set(ADAPTIVE) <= set(INTEGRATOR_NAMES)
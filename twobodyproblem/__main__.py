@@ -1,20 +1,22 @@
 import argparse
+import json
 import sys
 
 import twobodyproblem
 from twobodyproblem.options import Options
 from twobodyproblem.values import Values
-from twobodyproblem.visualization.simulation import run_simulation
 
 if __name__ == "__main__":
     # add CLI arguments
     parser = argparse.ArgumentParser(
         prog="twobodyproblem",
         formatter_class=argparse.RawDescriptionHelpFormatter,
-        usage="python -m twobodyproblem [-h | -v] [-d]",
+        usage="python -m twobodyproblem [-h | -v] [-d [--profile-log file]] [--checkpoint file] "
+              "[--resume file] [--process]\n       python -m twobodyproblem run [-h] ...",
         description="This is a little simulation of the gravitational two body problem.\nTo run "
                     "the simulation normally, just run the command without any of the optional "
-                    "arguments.",
+                    "arguments.\nTo run it from scripts without any questions, use the run "
+                    "command.",
         epilog="For further information, visit:\nhttps://github.com/fflopsi/twobodyproblem"
     )
     parser.add_argument(
@@ -24,10 +26,137 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "-d", "--debug", action="store_true",
-        help="Run the program with debug info prints"
+        help="Run the program with debug info prints and frame timings"
+    )
+    parser.add_argument(
+        "--profile-log", default="profile.csv", metavar="file",
+        help="CSV file for the times of every frame in debug mode"
+    )
+    parser.add_argument(
+        "--checkpoint", metavar="file",
+        help="Save the state of the simulation every few seconds to a checkpoint file"
+    )
+    parser.add_argument(
+        "--resume", metavar="file",
+        help="Continue the simulation from a checkpoint file instead of asking for values"
+    )
+    parser.add_argument(
+        "--process", action="store_true",
+        help="Calculate the physics in a separate process, independent of the drawing"
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    run_parser = subparsers.add_parser(
+        "run", prog="python -m twobodyproblem run",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        usage="python -m twobodyproblem run [-h] [--values file | --batch file] [--options file] "
+              "[--headless] [--until s] [--out file] [--every k] [--events file] [--jobs n] "
+              "[--chunk-size n] [--cache dir] [--summary file]",
+        help="Run the simulation from files, without questions",
+        description="Run the simulation with values and options from files. With --headless, "
+                    "the engine runs without\nvisualization and writes its results and a timing "
+                    "summary, which is printed as JSON.",
+    )
+    scenario = run_parser.add_mutually_exclusive_group()
+    scenario.add_argument(
+        "--values", metavar="file",
+        help="YAML file with the values (default standard values)"
+    )
+    scenario.add_argument(
+        "--batch", metavar="file",
+        help="Batch file (.npz or .csv) with one scenario per row, implies --headless"
+    )
+    run_parser.add_argument(
+        "--options", metavar="file",
+        help="YAML file with the options (default standard options)"
+    )
+    run_parser.add_argument(
+        "--headless", action="store_true",
+        help="Calculate without visualization"
+    )
+    run_parser.add_argument(
+        "--until", type=float, metavar="s",
+        help="Simulated time in seconds (default given by the options)"
+    )
+    run_parser.add_argument(
+        "--out", metavar="file",
+        help="Output file: trajectory (.npy) or all results (.npz) of a scenario, batch file "
+             "(.npz or .csv) with the results of a batch. Without --headless, the recording "
+             "of every restart goes to a new numbered file (file-1.npy, ...)"
+    )
+    run_parser.add_argument(
+        "--every", default=1, type=int, metavar="k",
+        help="Keep only every k-th step of the trajectory"
+    )
+    run_parser.add_argument(
+        "--events", metavar="file",
+        help="Save periapsis, apoapsis and escape events of a scenario to a CSV file"
+    )
+    run_parser.add_argument(
+        "--jobs", default=1, type=int, metavar="n",
+        help="Number of processes for a batch (0 for the number of cores)"
+    )
+    run_parser.add_argument(
+        "--chunk-size", default=1000, type=int, metavar="n",
+        help="Number of scenarios of a batch calculated together"
+    )
+    run_parser.add_argument(
+        "--cache", metavar="dir",
+        help="Directory of a result cache to read results from and store them in"
+    )
+    run_parser.add_argument(
+        "--summary", metavar="file",
+        help="Write the timing summary to a JSON file instead of the standard output"
     )
     args = parser.parse_args()
 
+    if args.command == "run":
+        options = Options.from_file(args.options) if args.options is not None else Options()
+        if not args.headless and args.batch is None:
+            if args.until is not None or args.cache is not None or args.summary is not None:
+                run_parser.error("--until, --cache and --summary need --headless")
+            if args.out is not None and not args.out.endswith(".npy"):
+                run_parser.error("the simulation can only be recorded to .npy files")
+            values = Values.from_file(args.values) if args.values is not None else Values()
+            from twobodyproblem.visualization.simulation import run_simulation
+            run_simulation(values=values, options=options, record=args.out,
+                           record_every=args.every, events=args.events)
+            sys.exit()
+        from twobodyproblem import headless
+        from twobodyproblem.cache import ResultCache
+        from twobodyproblem.events import save_events
+        until = args.until if args.until is not None else headless.duration(options)
+        if until <= 0:
+            run_parser.error("--until is needed as the options run endlessly")
+        if args.every < 1 or args.jobs < 0 or args.chunk_size < 1:
+            run_parser.error("--every and --chunk-size must be positive, --jobs not negative")
+        cache = ResultCache(args.cache) if args.cache is not None else None
+        if args.batch is not None:
+            if args.out is None:
+                run_parser.error("--out is needed for a batch")
+            if args.events is not None:
+                run_parser.error("--events is only available for a single scenario")
+            summary = headless.run_batch(args.batch, args.out, options, until,
+                                         jobs=args.jobs or None, chunk_size=args.chunk_size,
+                                         cache=cache)
+        else:
+            trajectory = args.out is not None
+            if trajectory and not args.out.endswith((".npy", ".npz")):
+                run_parser.error("the results of a scenario can only be saved to .npy or .npz")
+            values = Values.from_file(args.values) if args.values is not None else Values()
+            result, summary = headless.run_one(values, options, until,
+                                               every=args.every if trajectory else 0,
+                                               events=args.events is not None, cache=cache)
+            if trajectory:
+                headless.save_result(result, args.out, values, options, args.every)
+            if args.events is not None:
+                save_events(headless.event_table(result), args.events)
+        if args.summary is None:
+            print(json.dumps(summary, indent=2))
+        else:
+            with open(args.summary, "w+") as f:
+                json.dump(summary, f, indent=2)
+        sys.exit()
+
     if args.debug:
         print("Debugging activated...")
         print("Passed arguments:", end=" ")
@@ -41,24 +170,30 @@ if __name__ == "__main__":
     print("The unit is indicated in brackets [] if needed.")
     print("For the inputs that are yes/no, type 1 for yes and 0 for no.")
 
-    open_val = input("\nIf you want to import values from a file, type y/Y: ")
-    if open_val in ("y", "Y"):
-        path = input("Input the path to the file (if left empty, the standard file will be used): ")
-        if path == "":
-            values = Values.from_file()
-        else:
-            values = Values.from_file(path)
+    if args.resume is not None:
+        # the values are replaced by those stored in the checkpoint
+        print("\nThe values are taken from the checkpoint " + args.resume)
+        values = Values()
     else:
-        print("\nFirst, you need to input the values:")
-        values = Values.from_input()
-        save_val = input("\nIf you want to save these values to a file, type y/Y: ")
-        if save_val in ("y", "Y"):
+        open_val = input("\nIf you want to import values from a file, type y/Y: ")
+        if open_val in ("y", "Y"):
             path = input(
                 "Input the path to the file (if left empty, the standard file will be used): ")
             if path == "":
-                values.save()
+                values = Values.from_file()
             else:
-                values.save(path)
+                values = Values.from_file(path)
+        else:
+            print("\nFirst, you need to input the values:")
+            values = Values.from_input()
+            save_val = input("\nIf you want to save these values to a file, type y/Y: ")
+            if save_val in ("y", "Y"):
+                path = input(
+                    "Input the path to the file (if left empty, the standard file will be used): ")
+                if path == "":
+                    values.save()
+                else:
+                    values.save(path)
     if args.debug:
         print("Values:", end=" ")
         print(values.to_dict())
@@ -85,5 +220,8 @@ if __name__ == "__main__":
         print("Options:", end=" ")
         print(options.to_dict())
 
-    # start simulation
-    run_simulation(values=values, options=options)
+    # start simulation, vpython is only imported now as it starts its server on import
+    from twobodyproblem.visualization.simulation import run_simulation
+    run_simulation(values=values, options=options, profile=args.debug,
+                   profile_log=args.profile_log if args.debug else None,
+                   checkpoint=args.checkpoint, resume=args.resume, process=args.process)
@@ -0,0 +1,162 @@
+"""Columnar files for large batches of scenarios
+
+A batch is a table with one column per field of FIELDS, the flat names of Values.to_dict (e.g.
+sat_v0_z for the z velocity of the satellite), and one row per scenario. Further columns, like the
+results of a sweep, are kept as they are. Tables are stored as .npz (one array per column) or as
+.csv with a header line of the column names. Both formats can be read and written in chunks, so
+a batch does not have to fit into memory as Values objects.
+
+Only the central body and the satellite are stored, additional bodies are not supported.
+"""
+import itertools
+import os
+
+import numpy as np
+
+from twobodyproblem.values import FIELDS, Values
+
+
+def to_table(values) -> dict:
+    """Convert a sequence of Values objects to a table with an array for every field of FIELDS"""
+    rows = []
+    for v in values:
+        if v.others:
+            raise ValueError("batches cannot store additional bodies")
+        rows.append(v.to_list())
+    columns = np.array(rows, dtype=float).reshape(len(rows), len(FIELDS))
+    return {field: columns[:, i] for i, field in enumerate(FIELDS)}
+
+
+def to_values(table) -> list:
+    """Convert a table to a list of Values objects, one per row"""
+    _check(table)
+    columns = [np.asarray(table[field], dtype=float).tolist() for field in FIELDS]
+    return [Values.from_list(row) for row in zip(*columns)]
+
+
+def _check(table):
+    """Raise ValueError if a field is missing or the columns differ in length"""
+    missing = [field for field in FIELDS if field not in table]
+    if missing:
+        raise ValueError("missing columns: " + ", ".join(missing))
+    if len({np.shape(column)[0] for column in table.values()}) > 1:
+        raise ValueError("all columns must have the same length")
+
+
+def _format(path):
+    """Return npz or csv according to the extension of path"""
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension not in (".npz", ".csv"):
+        raise ValueError("batch files must end with .npz or .csv")
+    return extension[1:]
+
+
+class BatchWriter:
+    """Writes a batch file chunk by chunk
+
+    CSV rows are written to the file at once, the columns of an NPZ file are collected and
+    written when the writer is closed. The file is written under a temporary name and only
+    replaces path when it is complete.
+
+    Attributes:
+    path: Path of the batch file
+    columns: Names of the columns (default FIELDS, set by the first table written otherwise)
+    count: Number of written rows
+    """
+
+    def __init__(self, path, columns=None):
+        """Initialize a BatchWriter for path (.npz or .csv)"""
+        self.path = str(path)
+        self.columns = None if columns is None else tuple(columns)
+        self.count = 0
+        self._format = _format(path)
+        self._tmp = self.path + ".tmp"
+        self._parts = []
+        self._file = open(self._tmp, "w+") if self._format == "csv" else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, table):
+        """Append a table (dictionary of columns) or a sequence of Values objects"""
+        if not isinstance(table, dict):
+            table = to_table(table)
+        _check(table)
+        if self.columns is None:
+            self.columns = tuple(table)
+        data = np.column_stack([np.asarray(table[name], dtype=float) for name in self.columns])
+        if self._format == "csv":
+            if self._file.tell() == 0:
+                self._file.write(",".join(self.columns) + "\n")
+            np.savetxt(self._file, data, delimiter=",", fmt="%.17g")
+        else:
+            self._parts.append(data)
+        self.count += data.shape[0]
+
+    def close(self):
+        """Finish the file and move it to its path"""
+        if self._format == "csv":
+            if self._file.tell() == 0:
+                self._file.write(",".join(self.columns or FIELDS) + "\n")
+            self._file.close()
+        else:
+            columns = self.columns or FIELDS
+            data = np.concatenate(self._parts) if self._parts else np.empty((0, len(columns)))
+            with open(self._tmp, "w+b") as f:
+                np.savez(f, **{name: data[:, i] for i, name in enumerate(columns)})
+            self._parts = []
+        os.replace(self._tmp, self.path)
+
+    def abort(self):
+        """Stop writing and remove the unfinished file"""
+        if self._file is not None:
+            self._file.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+
+def save_batch(table, path):
+    """Save a table or a sequence of Values objects to a batch file (.npz or .csv)"""
+    with BatchWriter(path) as writer:
+        writer.write(table)
+
+
+def iter_batch(path, chunk_size=10000):
+    """Yield the tables of consecutive chunks of at most chunk_size rows of a batch file"""
+    if _format(path) == "npz":
+        table = load_batch(path)
+        size = np.shape(next(iter(table.values())))[0]
+        for start in range(0, size, chunk_size):
+            yield {name: column[start:start + chunk_size] for name, column in table.items()}
+        return
+    with open(str(path), "r") as f:
+        names = f.readline().strip().split(",")
+        while True:
+            lines = list(itertools.islice(f, chunk_size))
+            if not lines:
+                return
+            data = np.loadtxt(lines, delimiter=",", ndmin=2)
+            table = {name: data[:, i] for i, name in enumerate(names)}
+            _check(table)
+            yield table
+
+
+def load_batch(path) -> dict:
+    """Return the whole table of a batch file"""
+    if _format(path) == "npz":
+        with np.load(str(path)) as f:
+            table = {name: f[name] for name in f.files}
+        _check(table)
+        return table
+    chunks = list(iter_batch(path, chunk_size=1 << 20))
+    if not chunks:
+        with open(str(path), "r") as f:
+            names = f.readline().strip().split(",")
+        return {name: np.empty(0) for name in names}
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
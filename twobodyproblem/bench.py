@@ -0,0 +1,175 @@
+"""Benchmarks of the integrators
+
+Run with python -m twobodyproblem.bench to measure speed and accuracy of every integrator for a
+range of Δt on the default values and on scenarios built from the presets. The results are printed
+as JSON, each entry is one point of a work-precision diagram.
+"""
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import twobodyproblem
+from twobodyproblem import compiled, preset
+from twobodyproblem.constants import G
+from twobodyproblem.engine import Engine
+from twobodyproblem.integrators import INTEGRATORS
+from twobodyproblem.kepler import KeplerPropagator
+from twobodyproblem.values import Values
+
+
+def circular(central: str, sat: str, distance: str) -> Values:
+    """Return Values of preset bodies on a circular orbit at a preset distance"""
+    values = Values(central_mass=preset.mass(central), central_radius=preset.radius(central),
+                    sat_mass=preset.mass(sat), sat_radius=preset.radius(sat),
+                    distance=preset.distance(distance))
+    r = values.distance + values.central.radius + values.sat.radius
+    values.sat.velocity.z = -math.sqrt(G * (values.central.mass + values.sat.mass) / r)
+    return values
+
+
+def scenarios() -> dict:
+    """Return the benchmarked scenarios by name"""
+    return {
+        "default": Values(),
+        "EarthSat": circular("Earth", "Sputnik2", "EarthSat"),
+        "EarthMoon": circular("Earth", "Moon", "EarthMoon"),
+        "SunEarth": circular("Sun", "Earth", "AU")
+    }
+
+
+def measure(values: Values, integrator, delta_t, orbits=1.0, samples=100) -> dict:
+    """Integrate a number of orbits and return speed and error measures
+
+    The energy and angular momentum drifts are the largest relative deviations at the samples,
+    the position error is measured against the analytic solution at the end.
+    """
+    engine = Engine.from_values(values, integrator=integrator)
+    kepler = KeplerPropagator.from_engine(engine)
+    period = kepler.period
+    duration = orbits * period
+    steps = max(1, math.ceil(duration / delta_t))
+    energy = engine.energy()
+    momentum = engine.angular_momentum()
+    energy_drift = 0.0
+    momentum_drift = 0.0
+    wall = 0.0
+    done = 0
+    for i in range(1, samples + 1):
+        chunk = steps * i // samples - done
+        start = time.perf_counter()
+        engine.run(chunk, delta_t, collision_detection=False)
+        wall += time.perf_counter() - start
+        done += chunk
+        energy_drift = max(energy_drift, abs(engine.energy() / energy - 1))
+        momentum_drift = max(momentum_drift, float(
+            np.linalg.norm(engine.angular_momentum() - momentum) / np.linalg.norm(momentum)))
+    pos, _ = kepler.state(engine.t)
+    position_error = float(np.linalg.norm(engine.pos[1] - engine.pos[0] - (pos[1] - pos[0])))
+    internal_steps = engine.steps
+
+    # memory is traced in a separate short run, tracing slows down the calculation
+    engine = Engine.from_values(values, integrator=integrator)
+    tracemalloc.start()
+    engine.run(min(steps, 1000), delta_t, collision_detection=False)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "integrator": integrator,
+        "delta_t": delta_t,
+        "steps": steps,
+        "internal_steps": internal_steps,
+        "simulated_time": done * delta_t,
+        "wall_time": wall,
+        "steps_per_second": steps / wall if wall > 0 else None,
+        "wall_time_per_orbit": wall / (done * delta_t / period),
+        "peak_memory_bytes": peak,
+        "energy_drift": energy_drift,
+        "angular_momentum_drift": momentum_drift,
+        "position_error": position_error
+    }
+
+
+def run(names=None, integrators=None, steps_per_orbit=(100, 1000, 10000), delta_t=None,
+        orbits=1.0, progress=True) -> dict:
+    """Run the benchmarks and return the results as a dictionary ready for JSON
+
+    Arguments:
+    names: names of the scenarios (default all)
+    integrators: names of the integrators (default all)
+    steps_per_orbit: Δt values given as fractions of the orbital period
+    delta_t: Δt values in s, used instead of steps_per_orbit if given (default None)
+    orbits: number of orbits to integrate (default 1.0)
+    progress: print the progress to stderr (default True)
+    """
+    available = scenarios()
+    results = []
+    for name in names or available:
+        values = available[name]
+        period = KeplerPropagator.from_values(values).period
+        steps = [period / n for n in steps_per_orbit] if delta_t is None else list(delta_t)
+        for integrator in integrators or INTEGRATORS:
+            for dt in steps:
+                if progress:
+                    print("{} {} Δt={:.6g}".format(name, integrator, dt), file=sys.stderr)
+                result = measure(values, integrator, dt, orbits)
+                result["scenario"] = name
+                result["period"] = period
+                results.append(result)
+    return {
+        "version": twobodyproblem.__version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "backend": compiled.backend(),
+        "results": results
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="twobodyproblem.bench",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Measure steps per second, wall time per orbit, peak memory and the energy "
+                    "and angular momentum drift of the integrators.",
+        epilog="For further information, visit:\nhttps://github.com/fflopsi/twobodyproblem"
+    )
+    parser.add_argument(
+        "-s", "--scenarios", nargs="*", choices=list(scenarios()), default=None,
+        help="The scenarios to benchmark (default all)"
+    )
+    parser.add_argument(
+        "-i", "--integrators", nargs="*", choices=list(INTEGRATORS), default=None,
+        help="The integrators to benchmark (default all)"
+    )
+    parser.add_argument(
+        "-n", "--steps-per-orbit", nargs="*", type=int, default=[100, 1000, 10000],
+        help="Δt values as fractions of the orbital period"
+    )
+    parser.add_argument(
+        "-t", "--delta-t", nargs="*", type=float, default=None,
+        help="Δt values in s, used instead of --steps-per-orbit"
+    )
+    parser.add_argument(
+        "--orbits", type=float, default=1.0,
+        help="Number of orbits to integrate"
+    )
+    parser.add_argument(
+        "-o", "--output", default=None,
+        help="Write the JSON to this file instead of the standard output"
+    )
+    args = parser.parse_args()
+
+    report = run(names=args.scenarios, integrators=args.integrators,
+                 steps_per_orbit=args.steps_per_orbit, delta_t=args.delta_t, orbits=args.orbits)
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w+") as f:
+            json.dump(report, f, indent=2)
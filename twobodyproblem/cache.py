@@ -0,0 +1,227 @@
+"""Cache of simulation results on disk
+
+A result is stored under the SHA-256 hash of everything it depends on: the Values, the Options
+fields used by the engine, the length of the run and what was recorded, and a version stamp. So
+changes to the engine that alter results only need an increase of ENGINE_VERSION to invalidate all
+entries. Every entry is a small uncompressed .npz file. Reading an entry updates its modification
+time, and when the cache grows beyond its size limit, the entries used least recently are removed.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+import twobodyproblem
+from twobodyproblem.engine import Engine
+from twobodyproblem.events import EventDetector
+from twobodyproblem.options import Options
+from twobodyproblem.values import Values
+
+# increased when changes to the engine or to simulate change the results
+ENGINE_VERSION = 1
+# fields of Options that change the result of a run of a given length
+RUN_OPTIONS = ("delta_t", "integrator", "rtol", "atol", "force", "theta")
+
+
+def simulate(values: Values, options: Options, until, every=0, events=False,
+             collision_detection=True) -> dict:
+    """Calculate a scenario without visualization and return its results
+
+    The dictionary holds the final t, steps, pos, vel and collided, with every > 0 also the
+    arrays trajectory_t, trajectory_pos, trajectory_vel of the initial state and every k-th
+    step, and with events the arrays event_kind (index into events.KINDS), event_t,
+    event_distance and event_speed of the central body and the satellite.
+
+    Arguments:
+    values: Values object of the scenario
+    options: Options object, only the fields of RUN_OPTIONS are used
+    until: simulated time in s, rounded up to whole steps of options.delta_t
+    every: number of steps between two states of the trajectory (default 0 for none)
+    events: detect periapsis, apoapsis, escape and capture (default False)
+    collision_detection: stop at the first contact of the bodies (default True)
+    """
+    if until < 0:
+        raise ValueError("until must not be negative")
+    if every < 0:
+        raise ValueError("every must not be negative")
+    engine = Engine.from_values(values, integrator=options.integrator, rtol=options.rtol,
+                                atol=options.atol, force=options.force, theta=options.theta)
+    steps = int(np.ceil(until / options.delta_t))
+    detector = EventDetector() if events else None
+    trajectory = [(engine.t, engine.pos.copy(), engine.vel.copy())] if every > 0 else None
+    collided = False
+    done = 0
+    while done < steps and not collided:
+        batch = min(every if every > 0 else steps, steps - done)
+        if detector is not None:
+            collided = detector.run(engine, batch, options.delta_t, collision_detection)
+        else:
+            collided = engine.run(batch, options.delta_t, collision_detection)
+        done += batch
+        if trajectory is not None:
+            trajectory.append((engine.t, engine.pos.copy(), engine.vel.copy()))
+    result = {"t": engine.t, "steps": engine.steps, "pos": engine.pos, "vel": engine.vel,
+              "collided": collided}
+    if trajectory is not None:
+        result["trajectory_t"] = np.array([state[0] for state in trajectory])
+        result["trajectory_pos"] = np.array([state[1] for state in trajectory])
+        result["trajectory_vel"] = np.array([state[2] for state in trajectory])
+    if detector is not None:
+        for name, column in detector.to_table().items():
+            result["event_" + name] = column
+    return result
+
+
+def _canonical(data):
+    """Return data with all numbers as floats, so that e.g. 1 and 1.0 hash alike"""
+    if isinstance(data, dict):
+        return {str(key): _canonical(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_canonical(value) for value in data]
+    if isinstance(data, (int, float, np.number)) and not isinstance(data, bool):
+        return float(data)
+    return data
+
+
+def _digest(data) -> str:
+    """Return the SHA-256 hash of data together with the version stamps"""
+    data = dict(data, version=[twobodyproblem.__version__, ENGINE_VERSION])
+    text = json.dumps(_canonical(data), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    """Stores results of simulate, or other dictionaries of arrays, in a directory of limited size
+
+    Attributes:
+    directory: Directory of the cache files
+    max_bytes: Size limit of all entries together in bytes
+    hits: Number of results read from the cache
+    misses: Number of results calculated by run
+    """
+
+    def __init__(self, directory=None, max_bytes=256 * 2 ** 20):
+        """Initialize a ResultCache
+
+        Arguments:
+        directory: directory of the cache (default [user home dir]/Documents/TwoBodyProblem/cache)
+        max_bytes: size limit in bytes (default 256 MiB)
+        """
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        self.directory = str(directory) if directory is not None else \
+            str(Path.home()) + "/Documents/TwoBodyProblem/cache"
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(values: Values, options: Options, until, every=0, events=False,
+            collision_detection=True) -> str:
+        """Return the hash of a run of simulate with these arguments"""
+        return _digest({
+            "values": values.to_dict(),
+            "options": {name: getattr(options, name) for name in RUN_OPTIONS},
+            "until": until,
+            "every": every,
+            "events": bool(events),
+            "collision_detection": bool(collision_detection)
+        })
+
+    @staticmethod
+    def table_key(table: dict, options: Options, until) -> str:
+        """Return the hash of the results of a table of scenarios, e.g. a chunk of a batch"""
+        digest = hashlib.sha256()
+        for name in sorted(table):
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(table[name], dtype="<f8").tobytes())
+        return _digest({
+            "table": digest.hexdigest(),
+            "options": {name: getattr(options, name) for name in RUN_OPTIONS},
+            "until": until
+        })
+
+    def _path(self, key):
+        """Return the path of the entry key"""
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key):
+        """Return the result stored under key and mark it as used, or None"""
+        path = self._path(key)
+        try:
+            with np.load(path) as f:
+                result = {name: f[name] for name in f.files}
+            os.utime(path)
+        except (OSError, ValueError):
+            # missing, or removed or damaged by another process
+            return None
+        for name, value in result.items():
+            if value.ndim == 0:
+                # numbers like t, steps and collided
+                result[name] = value.item()
+        return result
+
+    def put(self, key, result: dict):
+        """Store a result under key atomically and remove old entries beyond the size limit"""
+        path = self._path(key)
+        tmp = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp, "w+b") as f:
+            np.savez(f, **result)
+        os.replace(tmp, path)
+        self.evict()
+
+    def run(self, values: Values, options: Options, until, every=0, events=False,
+            collision_detection=True) -> dict:
+        """Return the cached result of simulate with these arguments, calculating it if needed"""
+        key = self.key(values, options, until, every, events, collision_detection)
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = simulate(values, options, until, every, events, collision_detection)
+        self.put(key, result)
+        return result
+
+    def _entries(self):
+        """Return (modification time, size, path) of all entries, least recently used first"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npz"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    @property
+    def size(self):
+        """Get the size of all entries in bytes"""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits its size limit"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all entries"""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,106 @@
+"""Checkpoints of the full engine state for resuming long simulations
+
+A checkpoint is a small uncompressed .npz file with the arrays and settings of an Engine, the
+Values it was created from and further numbers like frame counters. It is written to a temporary
+file first and then renamed, so a crash while writing leaves the previous checkpoint intact.
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from twobodyproblem.engine import Engine
+from twobodyproblem.values import Values
+
+# increased when the content of the checkpoints changes incompatibly
+VERSION = 1
+
+
+def save_checkpoint(path, engine: Engine, values: Values = None, **extra):
+    """Write the state of engine to path atomically
+
+    Arguments:
+    path: path of the checkpoint file
+    engine: Engine to save
+    values: Values object stored along (default None)
+    extra: further numbers to store, e.g. frame counters
+    """
+    path = str(path)
+    tmp = path + ".tmp"
+    settings = {
+        "version": VERSION,
+        "names": list(engine.names),
+        "integrator": engine.integrator,
+        "rtol": engine.rtol,
+        "atol": engine.atol,
+        "h": engine.h,
+        "force": engine.force,
+        "theta": engine.theta,
+        "softening": engine.softening,
+        "t": engine.t,
+        "steps": engine.steps,
+        "values": values.to_dict() if values is not None else None,
+        "extra": extra
+    }
+    with open(tmp, "w+b") as f:
+        np.savez(f, mass=engine.mass, radius=engine.radius, pos=engine.pos, vel=engine.vel,
+                 settings=np.array(json.dumps(settings)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    """Return the Engine, the Values (or None) and the extra numbers of a checkpoint"""
+    with np.load(str(path)) as f:
+        settings = json.loads(str(f["settings"]))
+        if settings["version"] != VERSION:
+            raise ValueError("checkpoint version {} is not supported".format(settings["version"]))
+        engine = Engine(mass=f["mass"], radius=f["radius"], pos=f["pos"], vel=f["vel"],
+                        names=settings["names"], integrator=settings["integrator"],
+                        rtol=settings["rtol"], atol=settings["atol"], force=settings["force"],
+                        theta=settings["theta"], softening=settings["softening"])
+    engine.h = settings["h"]
+    engine.t = settings["t"]
+    engine.steps = settings["steps"]
+    values = Values.from_dict(settings["values"]) if settings["values"] is not None else None
+    return engine, values, settings["extra"]
+
+
+class Checkpointer:
+    """Writes checkpoints of an engine at most every interval seconds of wall time
+
+    Attributes:
+    path: Path of the checkpoint file
+    interval: Wall time in s between two checkpoints
+    values: Values object stored in every checkpoint
+    count: Number of written checkpoints
+    """
+
+    def __init__(self, path, interval=5.0, values: Values = None):
+        """Initialize a Checkpointer, the first checkpoint is due after interval seconds"""
+        if interval < 0:
+            raise ValueError("interval must not be negative")
+        self.path = str(path)
+        self.interval = interval
+        self.values = values
+        self.count = 0
+        self._last = time.monotonic()
+
+    def due(self) -> bool:
+        """Return True if the next checkpoint is due"""
+        return time.monotonic() - self._last >= self.interval
+
+    def save(self, engine: Engine, **extra):
+        """Write a checkpoint now"""
+        save_checkpoint(self.path, engine, self.values, **extra)
+        self.count += 1
+        self._last = time.monotonic()
+
+    def update(self, engine: Engine, **extra) -> bool:
+        """Write a checkpoint if one is due, return True if it was written"""
+        if not self.due():
+            return False
+        self.save(engine, **extra)
+        return True
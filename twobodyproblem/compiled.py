@@ -0,0 +1,25 @@
+"""Optional compiled versions of the hot loops
+
+If Numba is installed, the loops are compiled to machine code on first use (and cached on disk),
+otherwise the same functions run as plain Python. Set enabled to False to use plain Python even if
+Numba is installed.
+"""
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# use the compiled loops if they are available
+enabled = True
+
+
+def jit(function):
+    """Return the compiled version of function, or None without Numba"""
+    if numba is None:
+        return None
+    return numba.njit(cache=True, nogil=True)(function)
+
+
+def backend() -> str:
+    """Return the name of the backend in use, numba or python"""
+    return "numba" if numba is not None and enabled else "python"
@@ -0,0 +1,9 @@
+# gravitational constant in m³/(kg s²)
+G = 6.67430e-11
+
+# names of the integrators and force kernels, which integrators.INTEGRATORS and forces.FORCES map
+# to their functions, so the options can be checked without importing NumPy
+INTEGRATOR_NAMES = ("euler", "leapfrog", "yoshida4", "rk4", "dopri5")
+FORCE_NAMES = ("direct", "barnes_hut")
+# integrators with adaptive step size
+ADAPTIVE = ("dopri5",)
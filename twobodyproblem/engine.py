@@ -0,0 +1,386 @@
+import numpy as np
+
+from twobodyproblem.constants import G
+from twobodyproblem.forces import FORCES, barnes_hut, direct, overlaps
+from twobodyproblem.integrators import ADAPTIVE, INTEGRATORS
+from twobodyproblem.state import TwoBodyState
+
+
+def hermite(p0, v0, p1, v1, h, s):
+    """Interpolate position and velocity at the fraction s of a step of size h
+
+    The cubic Hermite interpolant matches the positions and velocities at both ends of the step.
+    """
+    s2 = s * s
+    s3 = s2 * s
+    pos = ((2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * h * v0 + (3 * s2 - 2 * s3) * p1
+           + (s3 - s2) * h * v1)
+    vel = ((6 * s2 - 6 * s) * p0 / h + (3 * s2 - 4 * s + 1) * v0 + (6 * s - 6 * s2) * p1 / h
+           + (3 * s2 - 2 * s) * v1)
+    return pos, vel
+
+
+def hermite_distance_poly(r0, u0, r1, u1, h):
+    """Return the squared length of the cubic Hermite path of a step as polynomial coefficients
+
+    The relative position r and velocity u at both ends of a step of size h define the path. The
+    result is an array of the 7 coefficients in the fraction of the step, highest power first,
+    like numpy.polyval expects them.
+    """
+    coefficients = np.array((2 * r0 + h * u0 - 2 * r1 + h * u1,
+                             -3 * r0 - 2 * h * u0 + 3 * r1 - h * u1, h * u0, r0))
+    return sum(np.convolve(coefficients[:, i], coefficients[:, i]) for i in range(3))
+
+
+def first_contact(r0, u0, r1, u1, h, distance):
+    """Return the first fraction of a step at which two bodies get closer than distance
+
+    The squared length of the cubic Hermite path of the step (see hermite_distance_poly) is a
+    polynomial of degree 6 in the fraction. Returns None if the path does not enter the sphere of
+    the given radius.
+    """
+    if np.dot(r0, r0) <= distance ** 2:
+        # already in contact at the start, only entering contacts are detected
+        return None
+    # the path lies in the convex hull of its Bézier control points
+    reach = max(np.linalg.norm(u0) * h / 3, np.linalg.norm(r1 - u1 * h / 3 - r0),
+                np.linalg.norm(r1 - r0))
+    if np.linalg.norm(r0) - reach > distance:
+        return None
+    squared = hermite_distance_poly(r0, u0, r1, u1, h)
+    squared[-1] -= distance ** 2
+    roots = np.roots(squared)
+    roots = roots[np.abs(roots.imag) < 1e-7].real
+    roots = roots[(roots >= 0) & (roots <= 1)]
+    if roots.size:
+        return float(roots.min())
+    if np.dot(r1, r1) < distance ** 2:
+        return 1.0
+    return None
+
+
+class Engine:
+    """Headless physics engine holding the state of all bodies in NumPy arrays
+
+    Index 0 is the central body, index 1 the satellite, further indices are additional bodies.
+    The engine does not depend on vpython, so it can be used without opening a canvas. Two bodies
+    are stepped with closed expressions, more bodies with the selected force kernel.
+
+    Attributes:
+    names: The names of the bodies
+    mass: Array of the masses of the bodies in kg, shape (N,)
+    radius: Array of the radii of the bodies in m, shape (N,)
+    pos: Array of the positions of the bodies in m, shape (N, 3)
+    vel: Array of the velocities of the bodies in m/s, shape (N, 3)
+    integrator: Name of the integrator used for a step
+    rtol: Relative tolerance of adaptive integrators
+    atol: Absolute tolerance of adaptive integrators
+    h: Proposed size of the next internal step of adaptive integrators
+    force: Name of the force kernel for more than two bodies (direct, barnes_hut)
+    theta: Opening angle of the Barnes-Hut kernel
+    softening: Softening length of the force kernels in m
+    t: Simulated time in s
+    steps: Number of calculated (internal) steps
+    """
+
+    def __init__(self, mass, radius, pos, vel, names=None, integrator="leapfrog", rtol=1e-9,
+                 atol=1e-6, force="direct", theta=0.5, softening=0.0):
+        """Initialize an Engine with masses, radii, positions and velocities of the bodies"""
+        self.mass = np.array(mass, dtype=float).reshape(-1)
+        n = self.mass.shape[0]
+        self.names = tuple(names) if names is not None else \
+            ("central", "sat") + tuple("other" + str(i) for i in range(1, n - 1))
+        self.radius = np.array(radius, dtype=float).reshape(-1)
+        self.pos = np.array(pos, dtype=float).reshape(-1, 3)
+        self.vel = np.array(vel, dtype=float).reshape(-1, 3)
+        if not (len(self.names) == self.radius.shape[0] == self.pos.shape[0]
+                == self.vel.shape[0] == n):
+            raise ValueError("names, masses, radii, positions and velocities must match")
+        if n < 2:
+            raise ValueError("the engine needs at least two bodies")
+        if np.any(self.mass == 0):
+            raise ValueError("mass must not be 0 (zero)")
+        if np.any(self.radius <= 0):
+            raise ValueError("radius must be positive")
+        if force not in FORCES:
+            raise ValueError("force must be one of " + ", ".join(FORCES))
+        self._gm = G * self.mass
+        self.integrator = integrator
+        self.rtol = rtol
+        self.atol = atol
+        self.h = None
+        self._last_acceleration = None
+        self.force = force
+        self.theta = theta
+        self.softening = softening
+        self.t = 0.0
+        self.steps = 0
+
+    @classmethod
+    def from_values(cls, values, integrator="leapfrog", rtol=1e-9, atol=1e-6, force="direct",
+                    theta=0.5, softening=0.0):
+        """Create Engine from a Values object
+
+        The central body starts at the origin, the satellite on the x axis with the given distance
+        between the surfaces of the two bodies, additional bodies at their own positions.
+        """
+        bodies = values.bodies
+        return cls(mass=[body.mass for body in bodies],
+                   radius=[body.radius for body in bodies],
+                   pos=values.positions(),
+                   vel=[(body.velocity.x, body.velocity.y, body.velocity.z) for body in bodies],
+                   integrator=integrator, rtol=rtol, atol=atol, force=force, theta=theta,
+                   softening=softening)
+
+    @property
+    def integrator(self):
+        """Get and set the name of the integrator"""
+        return self._integrator
+
+    @integrator.setter
+    def integrator(self, value):
+        if value not in INTEGRATORS:
+            raise ValueError("integrator must be one of " + ", ".join(INTEGRATORS))
+        self._integrator = value
+
+    def acceleration(self, pos=None):
+        """Return the gravitational accelerations of all bodies, shape (N, 3)
+
+        Arguments:
+        pos: positions to evaluate the accelerations at (default current positions)
+        """
+        if pos is None:
+            pos = self.pos
+        if pos.shape[0] > 2:
+            if self.force == "barnes_hut":
+                return barnes_hut(pos, self._gm, softening=self.softening, theta=self.theta)
+            return direct(pos, self._gm, softening=self.softening)
+        r = pos[1] - pos[0]
+        r3 = np.dot(r, r) ** 1.5
+        return np.array((self._gm[1] / r3 * r, -self._gm[0] / r3 * r))
+
+    def step(self, delta_t=10, contact=False):
+        """Calculate one step with the selected integrator
+
+        Adaptive integrators cover delta_t with as many internal steps as needed. With contact,
+        they check every internal step of two bodies for a contact and stop there. Returns True
+        if stopped by a contact.
+
+        Arguments:
+        delta_t: Δt value (seconds in one calculation) (default 10)
+        contact: stop adaptive integrators at the first contact of two bodies (default False)
+        """
+        if self._integrator in ADAPTIVE:
+            touched = []
+
+            def check(pos, vel, h):
+                s = self._contact(pos, vel, h)
+                if s is not None:
+                    touched.append(s)
+                return s
+
+            self.h, steps, covered = INTEGRATORS[self._integrator](
+                self.pos, self.vel, self.acceleration, delta_t, h=self.h, rtol=self.rtol,
+                atol=self.atol, contact=check if contact else None)
+            self.steps += steps
+            self.t += covered
+            return bool(touched)
+        if self._integrator == "leapfrog":
+            # reuse the accelerations of the last step if nothing moved the bodies since
+            a = self._last_acceleration[1] if self._last_acceleration is not None and \
+                np.array_equal(self._last_acceleration[0], self.pos) else None
+            a = INTEGRATORS["leapfrog"](self.pos, self.vel, self.acceleration, delta_t, a=a)
+            self._last_acceleration = (self.pos.copy(), a)
+        else:
+            INTEGRATORS[self._integrator](self.pos, self.vel, self.acceleration, delta_t)
+        self.steps += 1
+        self.t += delta_t
+        return False
+
+    def run(self, steps, delta_t=10, collision_detection=True):
+        """Calculate a number of steps, return True if stopped by a collision
+
+        With collision detection, the path of two bodies during each step (each internal step of
+        adaptive integrators) is checked for contact, so a fast satellite cannot pass through the
+        central body between two steps. The state is then set to the moment of first contact.
+        More bodies are checked after each step for pairs that did not overlap before.
+
+        Arguments:
+        steps: number of steps to calculate
+        delta_t: Δt value (seconds in one calculation) (default 10)
+        collision_detection: stop at the first contact of the bodies (default True)
+        """
+        done = 0
+        two = self.pos.shape[0] == 2
+        if collision_detection and not two:
+            # bodies already touching at the start only count once they have separated
+            touching = set(map(tuple, self.collisions().tolist()))
+        while done < steps:
+            if two and self._integrator in ("euler", "leapfrog"):
+                # fast path on plain floats, handing steps near a contact to the checks below
+                state = TwoBodyState.from_engine(self)
+                distance = self.radius[0] + self.radius[1]
+                guard = distance + 2 * state.max_speed(distance) * delta_t \
+                    if collision_detection else 0.0
+                fast = state.run(self._integrator, delta_t, steps - done, guard)
+                state.to_engine(self)
+                self.t += fast * delta_t
+                self.steps += fast
+                done += fast
+                if done == steps:
+                    break
+            if collision_detection and not two:
+                self.step(delta_t)
+                pairs = set(map(tuple, self.collisions().tolist()))
+                if pairs - touching:
+                    return True
+                touching = pairs
+            elif collision_detection and self._integrator in ADAPTIVE:
+                if self.step(delta_t, contact=True):
+                    return True
+            elif collision_detection:
+                pos = self.pos.copy()
+                vel = self.vel.copy()
+                self.step(delta_t)
+                if self.sweep_collision(pos, vel, delta_t):
+                    return True
+            else:
+                self.step(delta_t)
+            done += 1
+        return False
+
+    def propagate(self, steps, delta_t=10, every=1, collision_detection=True) -> dict:
+        """Calculate a number of steps and return the state after every k-th step
+
+        Between two samples, the steps run in one loop (compiled for two bodies if Numba is
+        installed), so large values of every leave only the loop itself. The dictionary holds the
+        arrays t, pos, vel of the samples and collided, True if stopped by a collision, which is
+        then the last sample.
+
+        Arguments:
+        steps: number of steps to calculate
+        delta_t: Δt value (seconds in one calculation) (default 10)
+        every: number of steps between two samples (default 1)
+        collision_detection: stop at the first contact of the bodies (default True)
+        """
+        if every < 1:
+            raise ValueError("every must be positive")
+        n = -(-steps // every)
+        t = np.empty(n)
+        pos = np.empty((n,) + self.pos.shape)
+        vel = np.empty((n,) + self.vel.shape)
+        collided = False
+        i = 0
+        while i < n and not collided:
+            collided = self.run(min(every, steps - i * every), delta_t, collision_detection)
+            t[i] = self.t
+            pos[i] = self.pos
+            vel[i] = self.vel
+            i += 1
+        return {"t": t[:i], "pos": pos[:i], "vel": vel[:i], "collided": collided}
+
+    def sample(self, times, delta_t=10, collision_detection=True) -> dict:
+        """Calculate until the last of times and return the states at these times
+
+        The engine steps with delta_t, adaptive integrators with their own step sizes up to
+        delta_t, and the states at the requested times are interpolated with the cubic Hermite
+        interpolant of the step around them. So the number of samples does not affect the step
+        size. The dictionary holds the arrays t, pos, vel of the samples and collided, True if
+        stopped by a collision, in which case the samples after the contact are missing.
+
+        Arguments:
+        times: sorted array of times in s, none before the current time t
+        delta_t: Δt value (seconds in one calculation) (default 10)
+        collision_detection: stop at the first contact of the bodies (default True)
+        """
+        times = np.asarray(times, dtype=float).reshape(-1)
+        if np.any(np.diff(times) < 0) or (times.size and times[0] < self.t):
+            raise ValueError("times must be sorted and must not lie before t")
+        pos = np.empty((times.size,) + self.pos.shape)
+        vel = np.empty((times.size,) + self.vel.shape)
+        adaptive = self._integrator in ADAPTIVE
+        if adaptive and self.h is None:
+            # an empty step only estimates the size of the first internal step
+            self.step(0.0)
+        collided = False
+        i = 0
+        while i < times.size and not collided:
+            if times[i] == self.t:
+                pos[i] = self.pos
+                vel[i] = self.vel
+                i += 1
+                continue
+            h = min(delta_t, self.h) if adaptive else delta_t
+            skip = int(np.ceil((times[i] - self.t) / h)) - 1
+            if skip > 0 and not adaptive:
+                # whole steps before the next sample need no interpolation
+                collided = self.run(skip, h, collision_detection)
+                continue
+            t0 = self.t
+            p0 = self.pos.copy()
+            v0 = self.vel.copy()
+            collided = self.run(1, h, collision_detection)
+            step = self.t - t0
+            while i < times.size and times[i] <= self.t:
+                pos[i], vel[i] = hermite(p0, v0, self.pos, self.vel, step, (times[i] - t0) / step)
+                i += 1
+        return {"t": times[:i], "pos": pos[:i], "vel": vel[:i], "collided": collided}
+
+    def sweep_collision(self, pos, vel, delta_t):
+        """Check the last step for a contact of the bodies and move the state to it
+
+        Returns True if the bodies touched during the step.
+
+        Arguments:
+        pos: positions at the start of the step
+        vel: velocities at the start of the step
+        delta_t: Δt value of the step
+        """
+        s = self._contact(pos, vel, delta_t)
+        if s is None:
+            return False
+        self.t -= (1 - s) * delta_t
+        return True
+
+    def _contact(self, pos, vel, h):
+        """Return the fraction of a step of size h at which two bodies touch, moving them there
+
+        Returns None without changes if the bodies do not touch during the step.
+        """
+        s = first_contact(pos[1] - pos[0], vel[1] - vel[0], self.pos[1] - self.pos[0],
+                          self.vel[1] - self.vel[0], h, self.radius[0] + self.radius[1])
+        if s is not None:
+            self.pos[:], self.vel[:] = hermite(pos, vel, self.pos.copy(), self.vel.copy(), h, s)
+        return s
+
+    def distance(self):
+        """Return the distance between the centers of the central body and the satellite"""
+        return float(np.linalg.norm(self.pos[1] - self.pos[0]))
+
+    def collisions(self):
+        """Return the index pairs (i < j) of all bodies that overlap or touch, shape (K, 2)"""
+        return overlaps(self.pos, self.radius)
+
+    def collided(self):
+        """Return True if any bodies overlap or touch (original radii)"""
+        if self.pos.shape[0] == 2:
+            return self.distance() <= (self.radius[0] + self.radius[1]) * (1 + 1e-9)
+        return self.collisions().shape[0] > 0
+
+    def energy(self, block=512):
+        """Return the total mechanical energy of the system in J"""
+        kinetic = 0.5 * np.sum(self.mass * np.sum(self.vel ** 2, axis=1))
+        potential = 0.0
+        for start in range(0, self.pos.shape[0], block):
+            stop = min(start + block, self.pos.shape[0])
+            d = self.pos[None, :, :] - self.pos[start:stop, None, :]
+            r = np.sqrt(np.einsum("ijk,ijk->ij", d, d))
+            # count every pair once
+            upper = np.arange(self.pos.shape[0])[None, :] > np.arange(start, stop)[:, None]
+            potential -= np.sum(np.where(upper, self._gm[start:stop, None] * self.mass[None, :]
+                                         / np.where(upper, r, 1.0), 0.0))
+        return float(kinetic + potential)
+
+    def angular_momentum(self):
+        """Return the total angular momentum vector of the system in kg m²/s"""
+        return np.sum(self.mass[:, None] * np.cross(self.pos, self.vel), axis=0)
@@ -0,0 +1,213 @@
+import numpy as np
+
+from twobodyproblem.constants import G
+from twobodyproblem.engine import first_contact, hermite
+from twobodyproblem.integrators import ADAPTIVE, INTEGRATORS
+
+
+class Ensemble:
+    """Advances many independent two body scenarios together with NumPy broadcasting
+
+    Scenario i has its central body at index [i, 0] and its satellite at index [i, 1]. Like in the
+    engine, the path of each step is checked for contact, and scenarios whose bodies collide are
+    frozen at the moment of first contact.
+
+    Attributes:
+    mass: Array of the masses in kg, shape (N, 2)
+    radius: Array of the radii in m, shape (N, 2)
+    pos: Array of the positions in m, shape (N, 2, 3)
+    vel: Array of the velocities in m/s, shape (N, 2, 3)
+    integrator: Name of the (fixed step) integrator
+    t: Simulated time in s
+    steps: Number of calculated steps
+    active: Boolean array of the scenarios still being calculated, shape (N,)
+    collision_time: Time of the collision of each scenario in s (NaN if none), shape (N,)
+    min_distance: Closest distance between the centers of the bodies so far in m, shape (N,)
+    """
+
+    def __init__(self, mass, radius, pos, vel, integrator="leapfrog"):
+        """Initialize an Ensemble with masses, radii, positions and velocities of all scenarios"""
+        self.mass = np.array(mass, dtype=float).reshape(-1, 2)
+        n = self.mass.shape[0]
+        self.radius = np.array(radius, dtype=float).reshape(n, 2)
+        self.pos = np.array(pos, dtype=float).reshape(n, 2, 3)
+        self.vel = np.array(vel, dtype=float).reshape(n, 2, 3)
+        if np.any(self.mass == 0):
+            raise ValueError("mass must not be 0 (zero)")
+        if np.any(self.radius <= 0):
+            raise ValueError("radius must be positive")
+        if integrator not in INTEGRATORS or integrator in ADAPTIVE:
+            raise ValueError("integrator must be one of " + ", ".join(
+                name for name in INTEGRATORS if name not in ADAPTIVE))
+        self.integrator = integrator
+        self._last_acceleration = None
+        self.t = 0.0
+        self.steps = 0
+        self.active = np.ones(n, dtype=bool)
+        self.collision_time = np.full(n, np.nan)
+        self.min_distance = self.distance()
+
+    @classmethod
+    def from_arrays(cls, central_mass, central_radius, sat_mass, sat_radius, distance,
+                    central_v0=(0.0, 0.0, 0.0), sat_v0=(0.0, 0.0, 0.0), integrator="leapfrog"):
+        """Create Ensemble from (broadcastable) arrays of the parameters of Values
+
+        The bodies are placed like in the engine: the central body at the origin, the satellite on
+        the x axis with the given distance between the surfaces.
+
+        Arguments:
+        central_v0, sat_v0: velocities in m/s, shape (N, 3) or (3,)
+        all others: arrays of shape (N,) or scalars
+        """
+        central_v0 = np.asarray(central_v0, dtype=float)
+        sat_v0 = np.asarray(sat_v0, dtype=float)
+        scalars = [np.asarray(a, dtype=float).ravel() for a in (central_mass, central_radius,
+                                                                  sat_mass, sat_radius, distance)]
+        n = np.broadcast_shapes(*(a.shape for a in scalars), central_v0.shape[:-1],
+                                sat_v0.shape[:-1])
+        n = n[0] if n else 1
+        central_mass, central_radius, sat_mass, sat_radius, distance = (
+            np.broadcast_to(a, (n,)) for a in scalars)
+        pos = np.zeros((n, 2, 3))
+        pos[:, 1, 0] = distance + central_radius + sat_radius
+        vel = np.empty((n, 2, 3))
+        vel[:, 0] = np.broadcast_to(central_v0, (n, 3))
+        vel[:, 1] = np.broadcast_to(sat_v0, (n, 3))
+        return cls(mass=np.stack((central_mass, sat_mass), axis=1),
+                   radius=np.stack((central_radius, sat_radius), axis=1),
+                   pos=pos, vel=vel, integrator=integrator)
+
+    @classmethod
+    def from_values(cls, values, integrator="leapfrog"):
+        """Create Ensemble from a sequence of Values objects"""
+        return cls.from_arrays(
+            central_mass=[v.central.mass for v in values],
+            central_radius=[v.central.radius for v in values],
+            sat_mass=[v.sat.mass for v in values],
+            sat_radius=[v.sat.radius for v in values],
+            distance=[v.distance for v in values],
+            central_v0=[(v.central.velocity.x, v.central.velocity.y, v.central.velocity.z)
+                        for v in values],
+            sat_v0=[(v.sat.velocity.x, v.sat.velocity.y, v.sat.velocity.z) for v in values],
+            integrator=integrator)
+
+    def __len__(self):
+        return self.mass.shape[0]
+
+    @staticmethod
+    def _acceleration(mass, pos):
+        """Return the accelerations of all bodies for given masses and positions"""
+        r = pos[:, 1] - pos[:, 0]
+        r3 = np.sum(r * r, axis=-1, keepdims=True) ** 1.5
+        return np.stack((G * mass[:, 1:] / r3 * r, -G * mass[:, :1] / r3 * r), axis=1)
+
+    def distance(self):
+        """Return the distances between the centers of the bodies, shape (N,)"""
+        return np.linalg.norm(self.pos[:, 1] - self.pos[:, 0], axis=-1)
+
+    def step(self, delta_t=10, collision_detection=True):
+        """Calculate one step of all active scenarios
+
+        Arguments:
+        delta_t: Δt value (seconds in one calculation) (default 10)
+        collision_detection: stop scenarios at the first contact of the bodies (default True)
+        """
+        integrator = INTEGRATORS[self.integrator]
+        subset = not self.active.all()
+        if subset:
+            index = np.flatnonzero(self.active)
+            mass, pos, vel = self.mass[index], self.pos[index], self.vel[index]
+        else:
+            index = slice(None)
+            mass, pos, vel = self.mass, self.pos, self.vel
+        if collision_detection:
+            start = (pos.copy(), vel.copy())
+        if self.integrator == "leapfrog":
+            # reuse the accelerations of the last step if nothing moved the bodies since, the
+            # rows of finished scenarios are never read again
+            last = self._last_acceleration
+            if last is None or not np.array_equal(last[0], self.pos):
+                last = (None, np.empty_like(self.pos))
+                a = None
+            else:
+                a = last[1][index]
+            last[1][index] = integrator(pos, vel, lambda p: self._acceleration(mass, p), delta_t,
+                                        a=a)
+        else:
+            integrator(pos, vel, lambda p: self._acceleration(mass, p), delta_t)
+        if collision_detection:
+            distance = self._sweep_collisions(index, *start, pos, vel, delta_t)
+        else:
+            distance = np.linalg.norm(pos[:, 1] - pos[:, 0], axis=-1)
+        if subset:
+            self.pos[index] = pos
+            self.vel[index] = vel
+        if self.integrator == "leapfrog":
+            self._last_acceleration = (self.pos.copy(), last[1])
+        self.t += delta_t
+        self.steps += 1
+        self.min_distance[index] = np.minimum(self.min_distance[index], distance)
+
+    def _sweep_collisions(self, index, p0, v0, pos, vel, delta_t):
+        """Check a step of scenarios for contact like Engine.sweep_collision
+
+        Scenarios that touched are moved to the moment of first contact in pos and vel and
+        stopped. Returns the distances of the scenarios at the end of the step.
+
+        Arguments:
+        index: index of the scenarios of the step in the ensemble
+        p0, v0: positions and velocities of these scenarios at the start of the step
+        pos, vel: positions and velocities of these scenarios at the end of the step
+        delta_t: Δt value of the step
+        """
+        r0 = p0[:, 1] - p0[:, 0]
+        u0 = v0[:, 1] - v0[:, 0]
+        r1 = pos[:, 1] - pos[:, 0]
+        u1 = vel[:, 1] - vel[:, 0]
+        radius = self.radius[index].sum(axis=1)
+        # the same bound of the Hermite path as in first_contact, only rows within reach of a
+        # contact are checked one by one
+        start, end, *reach = np.linalg.norm(
+            (r0, r1, u0 * (delta_t / 3), r1 - u1 * (delta_t / 3) - r0, r1 - r0), axis=-1)
+        near = np.flatnonzero(start - np.maximum.reduce(reach) <= radius)
+        rows = np.arange(len(self))[index]
+        for i in near:
+            s = first_contact(r0[i], u0[i], r1[i], u1[i], delta_t, radius[i])
+            if s is None:
+                continue
+            pos[i], vel[i] = hermite(p0[i], v0[i], pos[i].copy(), vel[i].copy(), delta_t, s)
+            end[i] = np.linalg.norm(pos[i, 1] - pos[i, 0])
+            self.collision_time[rows[i]] = self.t + s * delta_t
+            self.active[rows[i]] = False
+        return end
+
+    def run(self, steps, delta_t=10, collision_detection=True):
+        """Calculate a number of steps, stop early when all scenarios collided
+
+        Arguments:
+        steps: number of steps to calculate
+        delta_t: Δt value (seconds in one calculation) (default 10)
+        collision_detection: stop scenarios at the first contact of the bodies (default True)
+        """
+        for _ in range(steps):
+            if not self.active.any():
+                break
+            self.step(delta_t, collision_detection)
+        return self
+
+    def energy(self):
+        """Return the total mechanical energy of each scenario in J, shape (N,)"""
+        kinetic = 0.5 * np.sum(self.mass * np.sum(self.vel ** 2, axis=-1), axis=1)
+        return kinetic - G * self.mass[:, 0] * self.mass[:, 1] / self.distance()
+
+    def results(self) -> dict:
+        """Return the final state and events of all scenarios as a dictionary of arrays"""
+        return {
+            "pos": self.pos.copy(),
+            "vel": self.vel.copy(),
+            "distance": self.distance(),
+            "energy": self.energy(),
+            "min_distance": self.min_distance.copy(),
+            "collided": ~np.isnan(self.collision_time),
+            "collision_time": self.collision_time.copy()
+        }
@@ -0,0 +1,187 @@
+"""Orbital events detected while the engine runs
+
+The detector compares the relative orbit of two bodies before and after each batch of steps.
+Periapsis and apoapsis are the sign changes of the radial velocity, refined to the extremum of the
+distance on the cubic Hermite path of the step. Escape and capture are the sign changes of the
+specific orbital energy, refined linearly. Only the events are kept, not the trajectory.
+"""
+import numpy as np
+
+from twobodyproblem.constants import G
+from twobodyproblem.engine import Engine, hermite, hermite_distance_poly
+
+KINDS = ("periapsis", "apoapsis", "escape", "capture")
+
+
+class Event:
+    """One orbital event
+
+    Attributes:
+    kind: One of KINDS
+    t: Simulated time of the event in s
+    distance: Distance between the centers of the bodies in m
+    speed: Relative speed of the bodies in m/s
+    """
+    __slots__ = ("kind", "t", "distance", "speed")
+
+    def __init__(self, kind, t, distance, speed):
+        """Initialize an Event"""
+        self.kind = kind
+        self.t = t
+        self.distance = distance
+        self.speed = speed
+
+    def __repr__(self):
+        return "Event({}, t={:.6g}, distance={:.6g}, speed={:.6g})".format(
+            self.kind, self.t, self.distance, self.speed)
+
+    def to_dict(self) -> dict:
+        """Convert the Event to a dictionary"""
+        return {"kind": self.kind, "t": self.t, "distance": self.distance, "speed": self.speed}
+
+
+def _extremum(r0, u0, r1, u1, h):
+    """Return the fraction of a step at which the distance on the Hermite path is extremal"""
+    roots = np.roots(np.polyder(hermite_distance_poly(r0, u0, r1, u1, h)))
+    roots = roots[np.abs(roots.imag) < 1e-7].real
+    roots = roots[(roots >= 0) & (roots <= 1)]
+    if roots.size == 0:
+        # numerically at an end of the step
+        return 0.0 if abs(np.dot(r0, u0)) < abs(np.dot(r1, u1)) else 1.0
+    return float(roots[np.argmin(np.abs(roots - 0.5))]) if roots.size > 1 else float(roots[0])
+
+
+class EventDetector:
+    """Detects orbital events of two bodies of an Engine
+
+    Attributes:
+    first, second: Indices of the two bodies (default central body and satellite)
+    every: Number of steps between two checks, more than one saves time but refines events on
+        longer intervals
+    on_event: Function called with every new Event, or None
+    events: List of the detected events
+    """
+
+    def __init__(self, first=0, second=1, every=1, on_event=None):
+        """Initialize an EventDetector"""
+        if every < 1:
+            raise ValueError("every must be positive")
+        self.first = first
+        self.second = second
+        self.every = every
+        self.on_event = on_event
+        self.events = []
+        self._previous = None
+
+    def _relative(self, engine: Engine):
+        """Return t, relative position and velocity, gravitational parameter of engine"""
+        r = engine.pos[self.second] - engine.pos[self.first]
+        u = engine.vel[self.second] - engine.vel[self.first]
+        mu = G * (engine.mass[self.first] + engine.mass[self.second])
+        return engine.t, r, u, mu
+
+    @staticmethod
+    def _energy(r, u, mu):
+        """Return the specific orbital energy in J/kg"""
+        return 0.5 * np.dot(u, u) - mu / np.linalg.norm(r)
+
+    def _emit(self, kind, t, r, u):
+        """Add an event"""
+        event = Event(kind, float(t), float(np.linalg.norm(r)), float(np.linalg.norm(u)))
+        self.events.append(event)
+        if self.on_event is not None:
+            self.on_event(event)
+
+    def reset(self, engine: Engine):
+        """Start detecting from the current state of engine, an unbound orbit counts as escape"""
+        self._previous = self._relative(engine)
+        t, r, u, mu = self._previous
+        if self._energy(r, u, mu) >= 0:
+            self._emit("escape", t, r, u)
+
+    def check(self, engine: Engine):
+        """Look for events between the last checked state and the current state of engine"""
+        if self._previous is None:
+            self.reset(engine)
+            return
+        t0, r0, u0, mu = self._previous
+        t1, r1, u1, _ = current = self._relative(engine)
+        self._previous = current
+        h = t1 - t0
+        if h <= 0:
+            return
+        v0 = np.dot(r0, u0)
+        v1 = np.dot(r1, u1)
+        # a radial velocity of exactly 0 at the start of a step counts for this step
+        if v0 <= 0 < v1 or v0 >= 0 > v1:
+            s = _extremum(r0, u0, r1, u1, h)
+            r, u = hermite(r0, u0, r1, u1, h, s)
+            self._emit("periapsis" if v1 > 0 else "apoapsis", t0 + s * h, r, u)
+        e0 = self._energy(r0, u0, mu)
+        e1 = self._energy(r1, u1, mu)
+        if (e0 < 0) != (e1 < 0):
+            s = e0 / (e0 - e1)
+            r, u = hermite(r0, u0, r1, u1, h, s)
+            self._emit("escape" if e0 < 0 else "capture", t0 + s * h, r, u)
+
+    def run(self, engine: Engine, steps, delta_t=10, collision_detection=True):
+        """Calculate a number of steps with engine.run, checking every few steps
+
+        Returns True if stopped by a collision, like Engine.run.
+        """
+        if self._previous is None:
+            self.reset(engine)
+        done = 0
+        while done < steps:
+            batch = min(self.every, steps - done)
+            collided = engine.run(batch, delta_t, collision_detection)
+            self.check(engine)
+            if collided:
+                return True
+            done += batch
+        return False
+
+    def of_kind(self, kind):
+        """Return the events of one kind"""
+        return [event for event in self.events if event.kind == kind]
+
+    def period(self):
+        """Return the mean time between periapsis (or apoapsis) passages, or None"""
+        for kind in ("periapsis", "apoapsis"):
+            times = [event.t for event in self.of_kind(kind)]
+            if len(times) > 1:
+                return (times[-1] - times[0]) / (len(times) - 1)
+        return None
+
+    def eccentricity(self):
+        """Return the eccentricity from the last periapsis and apoapsis distances, or None"""
+        periapsis = self.of_kind("periapsis")
+        apoapsis = self.of_kind("apoapsis")
+        if not periapsis or not apoapsis:
+            return None
+        low = periapsis[-1].distance
+        high = apoapsis[-1].distance
+        return (high - low) / (high + low)
+
+    def to_table(self) -> dict:
+        """Return the events as arrays kind (index into KINDS), t, distance and speed"""
+        return {
+            "kind": np.array([KINDS.index(event.kind) for event in self.events], dtype=int),
+            "t": np.array([event.t for event in self.events]),
+            "distance": np.array([event.distance for event in self.events]),
+            "speed": np.array([event.speed for event in self.events])
+        }
+
+    def save(self, path):
+        """Save the event log as CSV with the columns kind, t, distance, speed"""
+        save_events(self.to_table(), path)
+
+
+def save_events(table: dict, path):
+    """Save a table of events like EventDetector.to_table as CSV"""
+    with open(path, "w+") as f:
+        f.write("kind,t,distance,speed\n")
+        for kind, t, distance, speed in zip(table["kind"], table["t"], table["distance"],
+                                            table["speed"]):
+            f.write("{},{!r},{!r},{!r}\n".format(KINDS[kind], float(t), float(distance),
+                                                  float(speed)))
@@ -0,0 +1,231 @@
+"""Gravitational acceleration kernels for many bodies
+
+Every kernel takes the positions, shape (N, 3), and the products G·m, shape (N,), and returns the
+accelerations, shape (N, 3). The softening length is added to every distance to avoid singular
+forces in close encounters. The broad phase for overlapping bodies uses the same Morton keys.
+"""
+import numpy as np
+
+# number of bits per axis of the Morton keys, which limits the depth of the octree
+_BITS = 21
+
+
+def direct(pos, gm, softening=0.0, block=512):
+    """Sum all pairwise forces exactly, O(N²), in blocks of rows to bound the memory"""
+    acc = np.empty_like(pos)
+    eps2 = softening * softening
+    for start in range(0, pos.shape[0], block):
+        stop = min(start + block, pos.shape[0])
+        d = pos[None, :, :] - pos[start:stop, None, :]
+        r2 = np.einsum("ijk,ijk->ij", d, d) + eps2
+        # no force of a body on itself
+        r2[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        acc[start:stop] = np.einsum("ij,ijk->ik", gm[None, :] * r2 ** -1.5, d)
+    return acc
+
+
+def _spread(v):
+    """Spread the lowest 21 bits of v, so two zero bits follow every bit"""
+    v = v & 0x1fffff
+    v = (v | v << 32) & 0x1f00000000ffff
+    v = (v | v << 16) & 0x1f0000ff0000ff
+    v = (v | v << 8) & 0x100f00f00f00f00f
+    v = (v | v << 4) & 0x10c30c30c30c30c3
+    v = (v | v << 2) & 0x1249249249249249
+    return v
+
+
+def _accumulate(acc, index, values):
+    """Add the rows of values to the rows index of acc, also for repeated indices"""
+    for axis in range(3):
+        acc[:, axis] += np.bincount(index, weights=values[:, axis], minlength=acc.shape[0])
+
+
+class Octree:
+    """Octree of bodies built level by level from sorted Morton keys
+
+    The nodes of all levels are stored in flat arrays. A node covers the bodies order[start:end]
+    and its children are the nodes child_start to child_end.
+
+    Attributes:
+    gm: G·m products of the bodies
+    order: Indices of the bodies sorted by Morton key
+    keys: Morton keys of the bodies (unsorted)
+    size: Edge length of the nodes
+    mass: Sum of G·m of the bodies in the nodes
+    com: Centers of mass of the nodes
+    prefix: Morton key prefixes of the nodes
+    shift: Bits to shift a body key right to compare it with the prefix of the node
+    start, end: Range of the nodes in order
+    child_start, child_end: Range of the children of the nodes
+    """
+
+    def __init__(self, pos, gm, max_depth=_BITS):
+        """Build the octree of bodies with positions pos and G·m products gm"""
+        self.gm = gm
+        low = pos.min(axis=0)
+        extent = max(float((pos.max(axis=0) - low).max()), 1e-300) * (1 + 1e-9)
+        cells = ((pos - low) / extent * (1 << _BITS)).astype(np.int64)
+        cells = np.minimum(cells, (1 << _BITS) - 1)
+        self.keys = _spread(cells[:, 0]) << 2 | _spread(cells[:, 1]) << 1 | _spread(cells[:, 2])
+        self.order = np.argsort(self.keys, kind="stable")
+        sorted_keys = self.keys[self.order]
+        sorted_gm = gm[self.order]
+        sorted_moment = pos[self.order] * sorted_gm[:, None]
+        levels = []
+        offset = 0
+        for level in range(max_depth + 1):
+            shift = 3 * (_BITS - level)
+            prefixes = sorted_keys >> shift
+            start = np.flatnonzero(np.r_[True, prefixes[1:] != prefixes[:-1]])
+            end = np.r_[start[1:], prefixes.size]
+            levels.append((start, end, prefixes[start], shift, offset, level))
+            offset += start.size
+            if np.all(end - start == 1):
+                break
+        n = offset
+        self.size = np.empty(n)
+        self.mass = np.empty(n)
+        self.com = np.empty((n, 3))
+        self.prefix = np.empty(n, dtype=np.int64)
+        self.shift = np.empty(n, dtype=np.int64)
+        self.start = np.empty(n, dtype=np.int64)
+        self.end = np.empty(n, dtype=np.int64)
+        self.child_start = np.zeros(n, dtype=np.int64)
+        self.child_end = np.zeros(n, dtype=np.int64)
+        for i, (start, end, prefix, shift, offset, level) in enumerate(levels):
+            nodes = slice(offset, offset + start.size)
+            mass = np.add.reduceat(sorted_gm, start)
+            self.mass[nodes] = mass
+            self.com[nodes] = np.add.reduceat(sorted_moment, start, axis=0) / mass[:, None]
+            self.size[nodes] = extent / (1 << level)
+            self.prefix[nodes] = prefix
+            self.shift[nodes] = shift
+            self.start[nodes] = start
+            self.end[nodes] = end
+            if i + 1 < len(levels):
+                child_prefix = levels[i + 1][2] >> 3
+                child_offset = levels[i + 1][4]
+                self.child_start[nodes] = child_offset + np.searchsorted(child_prefix, prefix,
+                                                                         side="left")
+                self.child_end[nodes] = child_offset + np.searchsorted(child_prefix, prefix,
+                                                                       side="right")
+        # nodes of the deepest level with more than one body have no children
+        self.leaf = self.child_start == self.child_end
+
+    def acceleration(self, pos, theta=0.5, softening=0.0):
+        """Return the accelerations of bodies at pos (shape (N, 3)) caused by the tree
+
+        All bodies walk the tree together: a node far enough away (size / distance < theta) that
+        does not contain the body acts with its center of mass, the others are opened.
+        """
+        eps2 = softening * softening
+        acc = np.zeros_like(pos)
+        keys = self.keys
+        target = np.arange(pos.shape[0])
+        node = np.zeros(pos.shape[0], dtype=np.int64)
+        while target.size:
+            d = self.com[node] - pos[target]
+            r2 = np.einsum("ij,ij->i", d, d)
+            inside = (keys[target] >> self.shift[node]) == self.prefix[node]
+            accept = ~inside & (self.size[node] ** 2 < theta * theta * r2)
+            accept |= ~inside & self.leaf[node]
+            if accept.any():
+                f = self.mass[node[accept]] * (r2[accept] + eps2) ** -1.5
+                _accumulate(acc, target[accept], f[:, None] * d[accept])
+            open_ = ~accept
+            target = target[open_]
+            node = node[open_]
+            leaf = self.leaf[node]
+            if leaf.any():
+                # the body lies in a leaf with other bodies, sum these directly
+                self._direct_leaf(pos, target[leaf], node[leaf], acc, eps2)
+            target = target[~leaf]
+            node = node[~leaf]
+            counts = self.child_end[node] - self.child_start[node]
+            target = np.repeat(target, counts)
+            first = np.repeat(self.child_start[node], counts)
+            node = first + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return acc
+
+    def _direct_leaf(self, pos, target, node, acc, eps2):
+        """Add the forces of the other bodies of the leaves node on the bodies target"""
+        counts = self.end[node] - self.start[node]
+        target = np.repeat(target, counts)
+        first = np.repeat(self.start[node], counts)
+        source = self.order[first + np.arange(counts.sum())
+                            - np.repeat(np.cumsum(counts) - counts, counts)]
+        other = source != target
+        target = target[other]
+        source = source[other]
+        d = pos[source] - pos[target]
+        r2 = np.einsum("ij,ij->i", d, d) + eps2
+        f = self.gm[source] * r2 ** -1.5
+        _accumulate(acc, target, f[:, None] * d)
+
+
+def barnes_hut(pos, gm, softening=0.0, theta=0.5):
+    """Approximate the forces with a Barnes-Hut octree, O(N log N)"""
+    return Octree(pos, gm).acceleration(pos, theta=theta, softening=softening)
+
+
+def overlaps(pos, radius):
+    """Return the index pairs (i < j) of all bodies that overlap or touch, shape (K, 2)
+
+    Bodies are sorted into cubic cells by Morton key, so only bodies in the same or a neighboring
+    cell are compared. The cells are at least as large as the diameters of 99 % of the bodies,
+    the few larger bodies are compared with all others.
+    """
+    n = pos.shape[0]
+    low = pos.min(axis=0)
+    extent = float((pos.max(axis=0) - low).max())
+    cell = max(2 * float(np.quantile(radius, 0.99)), extent / n ** (1 / 3), 1e-300)
+    big = 2 * radius > cell
+    small = np.flatnonzero(~big)
+    cells = ((pos[small] - low) / cell).astype(np.int64)
+    keys = _spread(cells[:, 0]) << 2 | _spread(cells[:, 1]) << 1 | _spread(cells[:, 2])
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    first = []
+    second = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                if (dx, dy, dz) < (0, 0, 0):
+                    # every pair of neighboring cells is visited once
+                    continue
+                neighbor = cells + (dx, dy, dz)
+                valid = np.flatnonzero(np.all(neighbor >= 0, axis=1))
+                neighbor = neighbor[valid]
+                neighbor_keys = (_spread(neighbor[:, 0]) << 2 | _spread(neighbor[:, 1]) << 1
+                                 | _spread(neighbor[:, 2]))
+                start = np.searchsorted(sorted_keys, neighbor_keys, side="left")
+                counts = np.searchsorted(sorted_keys, neighbor_keys, side="right") - start
+                i = np.repeat(valid, counts)
+                j = order[np.repeat(start, counts) + np.arange(counts.sum())
+                          - np.repeat(np.cumsum(counts) - counts, counts)]
+                if (dx, dy, dz) == (0, 0, 0):
+                    keep = i < j
+                    i = i[keep]
+                    j = j[keep]
+                first.append(small[i])
+                second.append(small[j])
+    for b in np.flatnonzero(big):
+        # compare the large bodies with all others, pairs of two large bodies only once
+        others = np.flatnonzero(~big | (np.arange(n) > b))
+        first.append(np.full(others.size, b))
+        second.append(others)
+    first = np.concatenate(first)
+    second = np.concatenate(second)
+    d = pos[first] - pos[second]
+    r2 = np.einsum("ij,ij->i", d, d)
+    touching = r2 <= ((radius[first] + radius[second]) * (1 + 1e-9)) ** 2
+    pairs = np.sort(np.stack((first[touching], second[touching]), axis=1), axis=1)
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+# keep the names in line with constants.FORCE_NAMES
+FORCES = {
+    "direct": direct,
+    "barnes_hut": barnes_hut
+}
@@ -0,0 +1,234 @@
+"""Runs without visualization, for scripts and pipelines
+
+This is the backend of python -m twobodyproblem run --headless. A single scenario is calculated
+with simulate and saved as a trajectory or as all arrays of its result. A batch file of
+scenarios is read chunk by chunk, every chunk is calculated as a sweep (one vectorized ensemble)
+on one of several processes, and the scenarios are written as a batch file with the result
+columns of a sweep appended. Both return a summary with the timings of the run.
+"""
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from twobodyproblem.batch import BatchWriter, iter_batch
+from twobodyproblem.cache import ResultCache, simulate
+from twobodyproblem.constants import G
+from twobodyproblem.engine import Engine
+from twobodyproblem.events import KINDS
+from twobodyproblem.integrators import ADAPTIVE
+from twobodyproblem.options import Options
+from twobodyproblem.recorder import engine_metadata, record_dtype, save_metadata
+from twobodyproblem.sweep import RESULTS, Sweep
+from twobodyproblem.values import FIELDS, Values
+
+
+def duration(options: Options) -> float:
+    """Return the simulated time in s of a visual run with options, 0 if it runs endlessly"""
+    return float(options.rate * options.sim_time * options.steps_per_frame() * options.delta_t)
+
+
+def trajectory(result: dict):
+    """Return the trajectory of a result of simulate as trajectory records (see recorder)"""
+    if "trajectory_t" not in result:
+        raise ValueError("the result contains no trajectory")
+    records = np.empty(result["trajectory_t"].size, dtype=record_dtype(result["pos"].shape[0]))
+    records["t"] = result["trajectory_t"]
+    records["pos"] = result["trajectory_pos"]
+    records["vel"] = result["trajectory_vel"]
+    return records
+
+
+def event_table(result: dict) -> dict:
+    """Return the events of a result of simulate like EventDetector.to_table"""
+    if "event_t" not in result:
+        raise ValueError("the result contains no events")
+    return {name: result["event_" + name] for name in ("kind", "t", "distance", "speed")}
+
+
+def save_result(result: dict, path, values: Values = None, options: Options = None, every=1):
+    """Save a result of simulate, the trajectory records to .npy, all arrays to .npz
+
+    A trajectory gets the same metadata file as a recording, so it can be replayed.
+
+    Arguments:
+    result: result of simulate
+    path: .npy or .npz file
+    values: Values object of the scenario, for the names, masses and radii (default standard values)
+    options: Options object of the run, for Δt and the integrator (default standard options)
+    every: number of steps between two states of the trajectory (default 1)
+    """
+    extension = os.path.splitext(str(path))[1].lower()
+    if extension == ".npy":
+        records = trajectory(result)
+        values = values if values is not None else Values()
+        options = options if options is not None else Options()
+        metadata = engine_metadata(Engine.from_values(values), options.delta_t)
+        metadata.update({"integrator": options.integrator, "values": values.to_dict()})
+        np.save(str(path), records)
+        save_metadata(path, records["pos"].shape[1], every, metadata)
+    elif extension == ".npz":
+        np.savez(str(path), **result)
+    else:
+        raise ValueError("results must be saved to .npy or .npz files")
+
+
+def run_one(values: Values, options: Options, until, every=0, events=False, cache=None):
+    """Calculate one scenario, return its result and a summary of the run
+
+    Arguments:
+    values: Values object of the scenario
+    options: Options object with the settings of the engine
+    until: simulated time in s
+    every: number of steps between two states of the trajectory (default 0 for none)
+    events: detect periapsis, apoapsis, escape and capture (default False)
+    cache: ResultCache to read the result from or store it in (default None)
+    """
+    start = time.perf_counter()
+    hits = cache.hits if cache is not None else 0
+    if cache is not None:
+        result = cache.run(values, options, until, every, events)
+    else:
+        result = simulate(values, options, until, every, events)
+    wall = time.perf_counter() - start
+    summary = {
+        "scenarios": 1,
+        "steps": result["steps"],
+        "simulated_time": result["t"],
+        "collided": result["collided"],
+        "wall_time": wall,
+        "steps_per_second": result["steps"] / wall if wall > 0 else None,
+        "cached": cache is not None and cache.hits > hits
+    }
+    return result, summary
+
+
+def _adaptive(columns, options, until) -> dict:
+    """Calculate scenarios one by one with simulate, for the integrators an Ensemble lacks"""
+    n = columns["distance"].size
+    pos = np.empty((n, 2, 3))
+    vel = np.empty((n, 2, 3))
+    min_distance = columns["distance"] + columns["central_radius"] + columns["sat_radius"]
+    collision_time = np.full(n, np.nan)
+    periapsis = KINDS.index("periapsis")
+    for i, row in enumerate(zip(*(columns[field].tolist() for field in FIELDS))):
+        result = simulate(Values.from_list(row), options, until, events=True)
+        pos[i] = result["pos"]
+        vel[i] = result["vel"]
+        # the distance is smallest at a periapsis or at an end of the run
+        closest = result["event_distance"][result["event_kind"] == periapsis]
+        if closest.size:
+            min_distance[i] = min(min_distance[i], closest.min())
+        if result["collided"]:
+            collision_time[i] = result["t"]
+    mass = np.stack((columns["central_mass"], columns["sat_mass"]), axis=1)
+    distance = np.linalg.norm(pos[:, 1] - pos[:, 0], axis=-1)
+    kinetic = 0.5 * np.sum(mass * np.sum(vel ** 2, axis=-1), axis=1)
+    return {
+        "distance_final": distance,
+        "energy": kinetic - G * mass[:, 0] * mass[:, 1] / distance,
+        "min_distance": np.minimum(min_distance, distance),
+        "collided": ~np.isnan(collision_time),
+        "collision_time": collision_time
+    }
+
+
+def _calculate(columns, options, until, cache_directory, cache_size) -> dict:
+    """Calculate one chunk of a batch, or read it from the cache, and return its result columns
+
+    Fixed step integrators calculate the chunk as a sweep, adaptive ones scenario by scenario.
+    """
+    columns = {field: np.asarray(columns[field], dtype=float) for field in FIELDS}
+    cache = None
+    if cache_directory is not None:
+        cache = ResultCache(cache_directory, cache_size)
+        key = cache.table_key(columns, options, until)
+        results = cache.get(key)
+        if results is not None:
+            return results
+    if options.integrator in ADAPTIVE:
+        results = _adaptive(columns, options, until)
+    else:
+        sweep = Sweep(columns, int(np.ceil(until / options.delta_t)), options.delta_t,
+                      options.integrator, chunk_size=max(1, columns["distance"].size))
+        table = sweep.run(workers=1, progress=False)
+        results = {name: table[name] for name in RESULTS}
+    if cache is not None:
+        cache.put(key, results)
+    return results
+
+
+def _chunks(path, chunk_size, arguments, jobs):
+    """Yield the chunks of a batch file with their results in order
+
+    With more than one process, at most two chunks per process are read ahead of the writer.
+    """
+    if jobs == 1:
+        for chunk in iter_batch(path, chunk_size):
+            yield chunk, _calculate(chunk, *arguments)
+        return
+    workers = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in iter_batch(path, chunk_size):
+            pending.append((chunk, executor.submit(_calculate, chunk, *arguments)))
+            if len(pending) >= 2 * workers:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+
+
+def run_batch(path, out, options: Options, until, jobs=1, chunk_size=1000, cache=None,
+              progress=True) -> dict:
+    """Calculate all scenarios of a batch file and write them with the result columns of a sweep
+
+    Returns a summary of the run.
+
+    Arguments:
+    path: batch file of the scenarios (.npz or .csv)
+    out: batch file for the scenarios and results (.npz or .csv)
+    options: Options object with the settings of the engine
+    until: simulated time in s of every scenario
+    jobs: number of processes (default 1, None for the number of cores)
+    chunk_size: number of scenarios calculated together (default 1000)
+    cache: ResultCache to read the results of chunks from or store them in (default None)
+    progress: print the progress to stderr (default True)
+    """
+    arguments = (options, until, cache.directory if cache is not None else None,
+                 cache.max_bytes if cache is not None else 0)
+    steps = int(np.ceil(until / options.delta_t))
+    start = time.perf_counter()
+    scenarios = 0
+    calculated = 0
+    with BatchWriter(out) as writer:
+        for chunk, results in _chunks(path, chunk_size, arguments, jobs):
+            table = dict(chunk)
+            table.update(results)
+            writer.write(table)
+            scenarios += results["energy"].size
+            # steps of Δt until the end of the run or the collision
+            calculated += int(np.where(results["collided"],
+                                       np.ceil(results["collision_time"] / options.delta_t),
+                                       steps).sum())
+            if progress:
+                elapsed = time.perf_counter() - start
+                print("\r{} scenarios done, {:.0f} scenarios/s".format(
+                    scenarios, scenarios / elapsed if elapsed > 0 else 0), end="",
+                    file=sys.stderr, flush=True)
+    if progress and scenarios:
+        print(file=sys.stderr)
+    wall = time.perf_counter() - start
+    return {
+        "scenarios": scenarios,
+        "steps": calculated,
+        "simulated_time": until,
+        "jobs": jobs,
+        "wall_time": wall,
+        "steps_per_second": calculated / wall if wall > 0 else None,
+        "scenarios_per_second": scenarios / wall if wall > 0 else None
+    }
@@ -0,0 +1,166 @@
+"""Integrators for the physics engine
+
+Every integrator advances the position and velocity arrays in place by delta_t. The acceleration
+argument is a function returning the accelerations for given positions. Adaptive integrators cover
+delta_t with as many internal steps as their error control requires.
+"""
+import numpy as np
+
+from twobodyproblem.constants import ADAPTIVE
+
+# coefficients of the 4th order Yoshida integrator
+_CBRT2 = 2 ** (1 / 3)
+_W1 = 1 / (2 - _CBRT2)
+_W0 = -_CBRT2 / (2 - _CBRT2)
+_YOSHIDA_C = (_W1 / 2, (_W0 + _W1) / 2, (_W0 + _W1) / 2, _W1 / 2)
+_YOSHIDA_D = (_W1, _W0, _W1)
+
+# Butcher tableau of the Dormand-Prince 5(4) pair, the last row of _DOPRI_A is the 5th order
+# solution, _DOPRI_E the difference to the embedded 4th order solution
+_DOPRI_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+    (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84)
+)
+_DOPRI_E = (71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40)
+# smallest internal step of dopri5 relative to the covered time, and most rejections in a row
+_MIN_STEP = 16 * np.finfo(float).eps
+_MAX_REJECTED = 100
+
+
+def euler(pos, vel, acceleration, delta_t):
+    """Semi-implicit (symplectic) Euler, first order, the original step of the simulation"""
+    vel += acceleration(pos) * delta_t
+    pos += vel * delta_t
+
+
+def leapfrog(pos, vel, acceleration, delta_t, a=None):
+    """Leapfrog in kick-drift-kick form (velocity Verlet), second order and symplectic
+
+    Returns the accelerations at the new positions, which the next step takes as a to need only
+    one evaluation of the forces.
+
+    Arguments:
+    a: accelerations at pos (default calculated)
+    """
+    vel += (acceleration(pos) if a is None else a) * (delta_t / 2)
+    pos += vel * delta_t
+    a = acceleration(pos)
+    vel += a * (delta_t / 2)
+    return a
+
+
+def yoshida4(pos, vel, acceleration, delta_t):
+    """Yoshida composition of leapfrog steps, fourth order and symplectic"""
+    for c, d in zip(_YOSHIDA_C, _YOSHIDA_D):
+        pos += vel * (c * delta_t)
+        vel += acceleration(pos) * (d * delta_t)
+    pos += vel * (_YOSHIDA_C[3] * delta_t)
+
+
+def rk4(pos, vel, acceleration, delta_t):
+    """Classical Runge-Kutta, fourth order but not symplectic"""
+    k1_x = vel
+    k1_v = acceleration(pos)
+    k2_x = vel + k1_v * (delta_t / 2)
+    k2_v = acceleration(pos + k1_x * (delta_t / 2))
+    k3_x = vel + k2_v * (delta_t / 2)
+    k3_v = acceleration(pos + k2_x * (delta_t / 2))
+    k4_x = vel + k3_v * delta_t
+    k4_v = acceleration(pos + k3_x * delta_t)
+    pos += (k1_x + 2 * k2_x + 2 * k3_x + k4_x) * (delta_t / 6)
+    vel += (k1_v + 2 * k2_v + 2 * k3_v + k4_v) * (delta_t / 6)
+
+
+def _dopri5_attempt(pos, vel, acceleration, h, k1_v):
+    """Calculate one Dormand-Prince step of size h without changing pos and vel
+
+    Returns the new position, velocity and acceleration and the local error estimates for
+    position and velocity.
+    """
+    kx = [vel]
+    kv = [k1_v]
+    for row in _DOPRI_A[1:]:
+        x = pos + h * sum(a * k for a, k in zip(row, kx) if a)
+        v = vel + h * sum(a * k for a, k in zip(row, kv) if a)
+        kx.append(v)
+        kv.append(acceleration(x))
+    err_x = h * sum(e * k for e, k in zip(_DOPRI_E, kx) if e)
+    err_v = h * sum(e * k for e, k in zip(_DOPRI_E, kv) if e)
+    return x, v, kv[-1], err_x, err_v
+
+
+def dopri5(pos, vel, acceleration, delta_t, h=None, rtol=1e-9, atol=1e-6, contact=None):
+    """Dormand-Prince 5(4) with adaptive step size, fifth order but not symplectic
+
+    Returns the proposed size of the next internal step, the number of accepted steps and the
+    covered time, which is less than delta_t if contact stopped the integration. Raises
+    FloatingPointError and restores pos and vel if the step size collapses, e.g. when two bodies
+    pass through each other.
+
+    Arguments:
+    h: size of the first internal step (default estimated from the initial state)
+    rtol: relative tolerance of the local error (default 1e-9)
+    atol: absolute tolerance of the local error in SI units (default 1e-6)
+    contact: function called after every accepted step with the positions and velocities before
+        it and its size, returning the fraction of the step to stop at or None (default None)
+    """
+    a = acceleration(pos)
+    if h is None:
+        # crude estimate: a step that changes the state by about 1 % of its tolerance scale
+        scale_x = atol + rtol * np.abs(pos)
+        scale_v = atol + rtol * np.abs(vel)
+        d0 = np.sqrt(np.mean((pos / scale_x) ** 2) + np.mean((vel / scale_v) ** 2))
+        d1 = np.sqrt(np.mean((vel / scale_x) ** 2) + np.mean((a / scale_v) ** 2))
+        h = 0.01 * d0 / d1 if d0 > 1e-5 and d1 > 1e-5 else 1e-6
+    t = 0.0
+    accepted = 0
+    rejected = 0
+    initial = (pos.copy(), vel.copy())
+    while t < delta_t:
+        last = h >= delta_t - t
+        step = delta_t - t if last else h
+        if rejected > _MAX_REJECTED or (not last and step < _MIN_STEP * max(t, delta_t)):
+            # e.g. two bodies passing through each other, give up with the initial state
+            pos[:], vel[:] = initial
+            raise FloatingPointError(
+                "dopri5 cannot reach the tolerance, step size {:.3g} s".format(step))
+        x, v, a_new, err_x, err_v = _dopri5_attempt(pos, vel, acceleration, step, a)
+        scale_x = atol + rtol * np.maximum(np.abs(pos), np.abs(x))
+        scale_v = atol + rtol * np.maximum(np.abs(vel), np.abs(v))
+        err = np.sqrt((np.mean((err_x / scale_x) ** 2) + np.mean((err_v / scale_v) ** 2)) / 2)
+        factor = min(5.0, max(0.2, 0.9 * err ** -0.2)) if err > 0 else 5.0
+        if err <= 1:
+            if contact is not None:
+                start_pos = pos.copy()
+                start_vel = vel.copy()
+            pos[:] = x
+            vel[:] = v
+            a = a_new
+            accepted += 1
+            rejected = 0
+            if not last or step == h:
+                h = step * factor
+            if contact is not None:
+                s = contact(start_pos, start_vel, step)
+                if s is not None:
+                    return h, accepted, t + s * step
+            t = delta_t if last else t + step
+        else:
+            h = step * factor
+            rejected += 1
+    return h, accepted, t
+
+
+# keep the names in line with constants.INTEGRATOR_NAMES
+INTEGRATORS = {
+    "euler": euler,
+    "leapfrog": leapfrog,
+    "yoshida4": yoshida4,
+    "rk4": rk4,
+    "dopri5": dopri5
+}
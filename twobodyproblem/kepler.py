@@ -0,0 +1,209 @@
+"""Analytic solution of the two body problem
+
+The relative orbit is propagated with the universal variable formulation of Kepler's equation,
+which covers elliptic, parabolic and hyperbolic orbits alike, while the barycenter moves uniformly.
+"""
+import numpy as np
+
+from twobodyproblem.constants import G
+from twobodyproblem.engine import Engine
+
+
+def stumpff_c(z):
+    """Return the Stumpff function C(z) for an array of z"""
+    z = np.asarray(z, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        sqrt_z = np.sqrt(np.abs(z))
+        return np.where(z > 1e-6, (1 - np.cos(sqrt_z)) / z,
+                        np.where(z < -1e-6, (np.cosh(sqrt_z) - 1) / -z,
+                                 1 / 2 - z / 24 + z ** 2 / 720))
+
+
+def stumpff_s(z):
+    """Return the Stumpff function S(z) for an array of z"""
+    z = np.asarray(z, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        sqrt_z = np.sqrt(np.abs(z))
+        return np.where(z > 1e-6, (sqrt_z - np.sin(sqrt_z)) / sqrt_z ** 3,
+                        np.where(z < -1e-6, (np.sinh(sqrt_z) - sqrt_z) / sqrt_z ** 3,
+                                 1 / 6 - z / 120 + z ** 2 / 5040))
+
+
+class KeplerPropagator:
+    """Closed-form propagator for the state of two bodies at any time
+
+    Attributes:
+    mass: Array of the masses of the bodies in kg, shape (2,)
+    mu: Gravitational parameter G(m1 + m2) of the relative orbit in m³/s²
+    r0: Initial position of the satellite relative to the central body in m
+    v0: Initial velocity of the satellite relative to the central body in m/s
+    cm0: Initial position of the barycenter in m
+    v_cm: Velocity of the barycenter in m/s
+    alpha: Reciprocal of the semi-major axis in 1/m (0 for parabolic, negative for hyperbolic)
+    """
+
+    def __init__(self, mass, pos, vel):
+        """Initialize a KeplerPropagator with masses, positions and velocities at t = 0"""
+        self.mass = np.array(mass, dtype=float)
+        if self.mass.shape != (2,):
+            raise ValueError("the analytic solution needs exactly two bodies")
+        pos = np.array(pos, dtype=float).reshape(2, 3)
+        vel = np.array(vel, dtype=float).reshape(2, 3)
+        total = self.mass.sum()
+        self.mu = G * total
+        self.r0 = pos[1] - pos[0]
+        self.v0 = vel[1] - vel[0]
+        self.cm0 = (self.mass[:, None] * pos).sum(axis=0) / total
+        self.v_cm = (self.mass[:, None] * vel).sum(axis=0) / total
+        self._r0_norm = float(np.linalg.norm(self.r0))
+        if self._r0_norm == 0:
+            raise ValueError("the bodies must not start at the same position")
+        self._vr0 = float(np.dot(self.r0, self.v0)) / self._r0_norm
+        self.alpha = 2 / self._r0_norm - float(np.dot(self.v0, self.v0)) / self.mu
+
+    @classmethod
+    def from_values(cls, values):
+        """Create KeplerPropagator from a Values object, placed like in the engine"""
+        return cls.from_engine(Engine.from_values(values))
+
+    @classmethod
+    def from_engine(cls, engine):
+        """Create KeplerPropagator from the current state of an Engine"""
+        return cls(mass=engine.mass, pos=engine.pos, vel=engine.vel)
+
+    @property
+    def period(self):
+        """Get the orbital period in s (infinite for open orbits)"""
+        if self.alpha <= 0:
+            return np.inf
+        return 2 * np.pi / np.sqrt(self.mu * self.alpha ** 3)
+
+    def elements(self) -> dict:
+        """Return the classical orbital elements of the relative orbit
+
+        Angles are in radians, the semi-major axis is infinite for parabolic orbits.
+        """
+        r = self._r0_norm
+        h = np.cross(self.r0, self.v0)
+        h_norm = np.linalg.norm(h)
+        e_vec = ((np.dot(self.v0, self.v0) - self.mu / r) * self.r0
+                 - r * self._vr0 * self.v0) / self.mu
+        e = np.linalg.norm(e_vec)
+        node = np.cross((0.0, 0.0, 1.0), h)
+        node_norm = np.linalg.norm(node)
+        inclination = np.arccos(np.clip(h[2] / h_norm, -1, 1)) if h_norm > 0 else 0.0
+        raan = 0.0
+        if node_norm > 0:
+            raan = np.arccos(np.clip(node[0] / node_norm, -1, 1))
+            if node[1] < 0:
+                raan = 2 * np.pi - raan
+        # for equatorial or circular orbits the undefined angles are measured from the x axis
+        reference = node / node_norm if node_norm > 0 else np.array((1.0, 0.0, 0.0))
+        argp = 0.0
+        if e > 1e-12:
+            argp = np.arccos(np.clip(np.dot(reference, e_vec) / e, -1, 1))
+            if np.dot(np.cross(reference, e_vec), h) < 0:
+                argp = 2 * np.pi - argp
+            periapsis_dir = e_vec / e
+        else:
+            periapsis_dir = reference
+        nu = np.arccos(np.clip(np.dot(periapsis_dir, self.r0) / r, -1, 1))
+        if np.dot(np.cross(periapsis_dir, self.r0), h) < 0:
+            nu = 2 * np.pi - nu
+        return {
+            "semi_major_axis": 1 / self.alpha if self.alpha != 0 else np.inf,
+            "eccentricity": float(e),
+            "inclination": float(inclination),
+            "raan": float(raan),
+            "argument_of_periapsis": float(argp),
+            "true_anomaly": float(nu),
+            "semi_latus_rectum": float(h_norm ** 2 / self.mu),
+            "period": self.period
+        }
+
+    def universal_anomaly(self, t, tol=1e-12, max_iter=50):
+        """Solve the universal Kepler equation for an array of times t since the start
+
+        Laguerre iteration is used from a starting value for the type of the conic section. Raises
+        FloatingPointError if it does not converge within max_iter iterations.
+        """
+        t = np.asarray(t, dtype=float)
+        if self.alpha > 0:
+            # the solution is periodic, fold the times into one orbit
+            t = np.fmod(t, self.period)
+        sqrt_mu = np.sqrt(self.mu)
+        r0 = self._r0_norm
+        sigma0 = r0 * self._vr0 / sqrt_mu
+        if self.alpha > 0:
+            chi = sqrt_mu * self.alpha * t
+        else:
+            chi = sqrt_mu * t / r0
+        if self.alpha < 0:
+            # Vallado's starting value for hyperbolic orbits, where the linear one grows far too
+            # large once the satellite recedes, the smaller one is used near the start
+            a = 1 / self.alpha
+            sign = np.sign(t)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                hyperbolic = sign * np.sqrt(-a) * np.log(-2 * self.mu * self.alpha * t / (
+                    r0 * self._vr0 + sign * np.sqrt(-self.mu * a) * (1 - r0 * self.alpha)))
+            chi = np.where(np.isfinite(hyperbolic) & (np.abs(hyperbolic) < np.abs(chi)),
+                           hyperbolic, chi)
+        n = 5
+        for _ in range(max_iter):
+            z = self.alpha * chi ** 2
+            c = stumpff_c(z)
+            s = stumpff_s(z)
+            f = (sigma0 * chi ** 2 * c + (1 - self.alpha * r0) * chi ** 3 * s + r0 * chi
+                 - sqrt_mu * t)
+            df = sigma0 * chi * (1 - z * s) + (1 - self.alpha * r0) * chi ** 2 * c + r0
+            ddf = sigma0 * (1 - z * c) + (1 - self.alpha * r0) * chi * (1 - z * s)
+            root = np.sqrt(np.abs((n - 1) ** 2 * df ** 2 - n * (n - 1) * f * ddf))
+            delta = n * f / (df + np.copysign(root, df))
+            chi = chi - delta
+            if np.all(np.abs(delta) <= tol * np.maximum(1, np.abs(chi))):
+                break
+        else:
+            raise FloatingPointError(
+                "the universal Kepler equation did not converge in {} iterations".format(max_iter))
+        return chi, t
+
+    def relative_state(self, t):
+        """Return position and velocity of the satellite relative to the central body
+
+        Arguments:
+        t: time or array of times since the start in s
+
+        Returns two arrays of shape t.shape + (3,).
+        """
+        chi, t_fold = self.universal_anomaly(t)
+        z = self.alpha * chi ** 2
+        c = stumpff_c(z)[..., None]
+        s = stumpff_s(z)[..., None]
+        chi = chi[..., None]
+        r0 = self._r0_norm
+        sqrt_mu = np.sqrt(self.mu)
+        f = 1 - chi ** 2 / r0 * c
+        g = t_fold[..., None] - chi ** 3 / sqrt_mu * s
+        r = f * self.r0 + g * self.v0
+        r_norm = np.linalg.norm(r, axis=-1, keepdims=True)
+        df = sqrt_mu / (r_norm * r0) * (self.alpha * chi ** 3 * s - chi)
+        dg = 1 - chi ** 2 / r_norm * c
+        return r, df * self.r0 + dg * self.v0
+
+    def state(self, t):
+        """Return positions and velocities of both bodies at the given times
+
+        Arguments:
+        t: time or array of times since the start in s
+
+        Returns two arrays of shape t.shape + (2, 3).
+        """
+        t = np.asarray(t, dtype=float)
+        r, v = self.relative_state(t)
+        total = self.mass.sum()
+        cm = self.cm0 + t[..., None] * self.v_cm
+        pos = np.stack((cm - self.mass[1] / total * r, cm + self.mass[0] / total * r), axis=-2)
+        vel = np.stack((self.v_cm - self.mass[1] / total * v, self.v_cm + self.mass[0] / total * v),
+                       axis=-2)
+        return pos, vel
+
@@ -1,10 +1,12 @@
 import os
 from pathlib import Path
 
-import vpython as vp
-import yaml
+from twobodyproblem import yamlfile
+from twobodyproblem.constants import ADAPTIVE, FORCE_NAMES, INTEGRATOR_NAMES
+from twobodyproblem.vector import Vector
 
-defaults = (1000, 600, 255, 255, 255, 1, 255, 0, 0, 100, 30, 10, 0, 0, 1)
+defaults = (1000, 600, 255, 255, 255, 1, 255, 0, 0, 100, 30, 10, 0, 0, 1, "leapfrog", 1e-9, 1e-6, 1,
+            0.0, 2000, 1.0, "direct", 0.5)
 
 
 class Options:
@@ -20,6 +22,15 @@ class Options:
     central_centered: Visually center the central body
     testing: Enable testing features
     restart: Restart the program after the simulation ends
+    integrator: Name of the integrator (euler, leapfrog, yoshida4, rk4, dopri5)
+    rtol: Relative tolerance of adaptive integrators
+    atol: Absolute tolerance of adaptive integrators
+    substeps: Number of calculations per rendered frame
+    real_time_factor: Simulated seconds per real second, overrides substeps if positive
+    trail_length: Maximum number of points of each trail (0 for unlimited)
+    trail_angle: Minimum bend in degrees for a new trail point (0 to keep every point)
+    force: Name of the force kernel for more than two bodies (direct, barnes_hut)
+    theta: Opening angle of the Barnes-Hut force kernel
     """
 
     class Canvas:
@@ -72,8 +83,8 @@ class Options:
         def __init__(self, bodies_r=255, bodies_g=255, bodies_b=255, pointers_r=255, pointers_g=0,
                      pointers_b=0):
             """Initialize a Color class with RGB values for bodies and pointers"""
-            self.bodies = vp.vector(bodies_r, bodies_g, bodies_b)
-            self.pointers = vp.vector(pointers_r, pointers_g, pointers_b)
+            self.bodies = Vector(bodies_r, bodies_g, bodies_b)
+            self.pointers = Vector(pointers_r, pointers_g, pointers_b)
 
         @property
         def bodies(self):
@@ -82,6 +93,7 @@ class Options:
 
         @bodies.setter
         def bodies(self, value):
+            value = Vector.convert(value, "bodies")
             if not (0 <= value.x <= 255 and 0 <= value.y <= 255 and 0 <= value.z <= 255):
                 raise ValueError("RGB values must be between 0 and 255")
             self._bodies = value
@@ -93,6 +105,7 @@ class Options:
 
         @pointers.setter
         def pointers(self, value):
+            value = Vector.convert(value, "pointers")
             if not (0 <= value.x <= 255 and 0 <= value.y <= 255 and 0 <= value.z <= 255):
                 raise ValueError("RGB values must be between 0 and 255")
             self._pointers = value
@@ -103,7 +116,10 @@ class Options:
                  color_pointers_r=defaults[6], color_pointers_g=defaults[7],
                  color_pointers_b=defaults[8], update_rate=defaults[9], max_seconds=defaults[10],
                  delta_t=defaults[11], central_centered=defaults[12], testing=defaults[13],
-                 restart=defaults[14]):
+                 restart=defaults[14], integrator=defaults[15], rtol=defaults[16],
+                 atol=defaults[17], substeps=defaults[18], real_time_factor=defaults[19],
+                 trail_length=defaults[20], trail_angle=defaults[21], force=defaults[22],
+                 theta=defaults[23]):
         """Initialize an Options object with Canvas and Color objects split"""
         self.canvas = self.Canvas(width=canvas_width, height=canvas_height)
         self.colors = self.Color(bodies_r=color_objects_r, bodies_g=color_objects_g,
@@ -116,6 +132,15 @@ class Options:
         self.central_centered = bool(central_centered)
         self.testing = bool(testing)
         self.restart = bool(restart)
+        self.integrator = integrator
+        self.rtol = rtol
+        self.atol = atol
+        self.substeps = substeps
+        self.real_time_factor = real_time_factor
+        self.trail_length = trail_length
+        self.trail_angle = trail_angle
+        self.force = force
+        self.theta = theta
 
     @classmethod
     def from_dict(cls, values: dict):
@@ -130,7 +155,14 @@ class Options:
                    color_pointers_b=values["color"]["pointers"]["b"],
                    update_rate=values["update_rate"], max_seconds=values["max_seconds"],
                    delta_t=values["t_factor"], central_centered=values["do_central_centered"],
-                   testing=values["do_testing"], restart=values["do_restart"])
+                   testing=values["do_testing"], restart=values["do_restart"],
+                   integrator=values.get("integrator", defaults[15]),
+                   rtol=values.get("rtol", defaults[16]), atol=values.get("atol", defaults[17]),
+                   substeps=values.get("substeps", defaults[18]),
+                   real_time_factor=values.get("real_time_factor", defaults[19]),
+                   trail_length=values.get("trail_length", defaults[20]),
+                   trail_angle=values.get("trail_angle", defaults[21]),
+                   force=values.get("force", defaults[22]), theta=values.get("theta", defaults[23]))
 
     @classmethod
     def from_list(cls, values):
@@ -140,7 +172,16 @@ class Options:
                    color_pointers_r=values[6], color_pointers_g=values[7],
                    color_pointers_b=values[8], update_rate=values[9], max_seconds=values[10],
                    delta_t=values[11], central_centered=values[12], testing=values[13],
-                   restart=values[14])
+                   restart=values[14],
+                   integrator=values[15] if len(values) > 15 else defaults[15],
+                   rtol=values[16] if len(values) > 16 else defaults[16],
+                   atol=values[17] if len(values) > 17 else defaults[17],
+                   substeps=values[18] if len(values) > 18 else defaults[18],
+                   real_time_factor=values[19] if len(values) > 19 else defaults[19],
+                   trail_length=values[20] if len(values) > 20 else defaults[20],
+                   trail_angle=values[21] if len(values) > 21 else defaults[21],
+                   force=values[22] if len(values) > 22 else defaults[22],
+                   theta=values[23] if len(values) > 23 else defaults[23])
 
     @classmethod
     def from_file(cls, path=None):
@@ -156,7 +197,7 @@ class Options:
         if path is None:
             path = dir_path + "/settings.yml"
         with open(path, "r") as f:
-            return cls.from_dict(yaml.load(f, Loader=yaml.FullLoader))
+            return cls.from_dict(yamlfile.load(f))
 
     @classmethod
     def from_input(cls):
@@ -225,6 +266,45 @@ class Options:
             options[14] = int(input("Restart program after simulation (1): "))
         except ValueError:
             pass
+        integrator = input("Integrator (leapfrog)[" + ", ".join(INTEGRATOR_NAMES) + "]: ")
+        if integrator in INTEGRATOR_NAMES:
+            options[15] = integrator
+        if options[15] in ADAPTIVE:
+            try:
+                options[16] = float(input("Relative tolerance (1e-9): "))
+            except ValueError:
+                pass
+            try:
+                options[17] = float(input("Absolute tolerance (1e-6): "))
+            except ValueError:
+                pass
+        try:
+            options[19] = float(input("Real time factor, 0 for a fixed number of calculations per "
+                                      "frame (0)[simulated s per s]: "))
+        except ValueError:
+            pass
+        if options[19] <= 0:
+            try:
+                options[18] = int(input("Calculations per frame (1): "))
+            except ValueError:
+                pass
+        try:
+            options[20] = int(input("Maximum number of trail points, 0 for unlimited (2000): "))
+        except ValueError:
+            pass
+        try:
+            options[21] = float(input("Minimum bend for a new trail point (1)[°]: "))
+        except ValueError:
+            pass
+        force = input("Force kernel for more than two bodies (direct)[" + ", ".join(FORCE_NAMES)
+                      + "]: ")
+        if force in FORCE_NAMES:
+            options[22] = force
+        if options[22] == "barnes_hut":
+            try:
+                options[23] = float(input("Opening angle θ (0.5): "))
+            except ValueError:
+                pass
 
         return cls.from_list(options)
 
@@ -267,6 +347,131 @@ class Options:
             raise ValueError("delta_t must be positive")
         self._delta_t = value
 
+    @property
+    def integrator(self):
+        """Get and set the name of the integrator"""
+        return self._integrator
+
+    @integrator.setter
+    def integrator(self, value):
+        if not isinstance(value, str):
+            raise TypeError("integrator must be a string")
+        if value not in INTEGRATOR_NAMES:
+            raise ValueError("integrator must be one of " + ", ".join(INTEGRATOR_NAMES))
+        self._integrator = value
+
+    @property
+    def rtol(self):
+        """Get and set relative tolerance"""
+        return self._rtol
+
+    @rtol.setter
+    def rtol(self, value):
+        if not isinstance(value, int) and not isinstance(value, float):
+            raise TypeError("rtol must be a number")
+        if value < 0:
+            raise ValueError("rtol must not be negative")
+        self._rtol = value
+
+    @property
+    def atol(self):
+        """Get and set absolute tolerance"""
+        return self._atol
+
+    @atol.setter
+    def atol(self, value):
+        if not isinstance(value, int) and not isinstance(value, float):
+            raise TypeError("atol must be a number")
+        if value < 0:
+            raise ValueError("atol must not be negative")
+        if value == 0 and self.rtol == 0:
+            raise ValueError("atol and rtol must not both be 0 (zero)")
+        self._atol = value
+
+    @property
+    def substeps(self):
+        """Get and set number of calculations per frame"""
+        return self._substeps
+
+    @substeps.setter
+    def substeps(self, value):
+        if not isinstance(value, int):
+            raise TypeError("substeps must be an integer")
+        if value < 1:
+            raise ValueError("substeps must be positive")
+        self._substeps = value
+
+    @property
+    def real_time_factor(self):
+        """Get and set simulated seconds per real second (0 to use substeps)"""
+        return self._real_time_factor
+
+    @real_time_factor.setter
+    def real_time_factor(self, value):
+        if not isinstance(value, int) and not isinstance(value, float):
+            raise TypeError("real_time_factor must be a number")
+        if value < 0:
+            raise ValueError("real_time_factor must not be negative")
+        self._real_time_factor = value
+
+    @property
+    def trail_length(self):
+        """Get and set maximum number of trail points"""
+        return self._trail_length
+
+    @trail_length.setter
+    def trail_length(self, value):
+        if not isinstance(value, int):
+            raise TypeError("trail_length must be an integer")
+        if value < 0:
+            raise ValueError("trail_length must not be negative")
+        self._trail_length = value
+
+    @property
+    def trail_angle(self):
+        """Get and set minimum bend for a new trail point in degrees"""
+        return self._trail_angle
+
+    @trail_angle.setter
+    def trail_angle(self, value):
+        if not isinstance(value, int) and not isinstance(value, float):
+            raise TypeError("trail_angle must be a number")
+        if not 0 <= value < 180:
+            raise ValueError("trail_angle must be between 0 and 180")
+        self._trail_angle = value
+
+    @property
+    def force(self):
+        """Get and set the name of the force kernel"""
+        return self._force
+
+    @force.setter
+    def force(self, value):
+        if not isinstance(value, str):
+            raise TypeError("force must be a string")
+        if value not in FORCE_NAMES:
+            raise ValueError("force must be one of " + ", ".join(FORCE_NAMES))
+        self._force = value
+
+    @property
+    def theta(self):
+        """Get and set the opening angle of the Barnes-Hut force kernel"""
+        return self._theta
+
+    @theta.setter
+    def theta(self, value):
+        if not isinstance(value, int) and not isinstance(value, float):
+            raise TypeError("theta must be a number")
+        if value < 0:
+            raise ValueError("theta must not be negative")
+        self._theta = value
+
+    def steps_per_frame(self) -> int:
+        """Return the number of calculations per frame from real_time_factor or substeps"""
+        if self.real_time_factor > 0:
+            return max(1, round(self.real_time_factor / (self.rate * self.delta_t)))
+        return self.substeps
+
     def to_dict(self) -> dict:
         """Convert the Options object to a dictionary"""
         return {
@@ -292,7 +497,16 @@ class Options:
             "t_factor": self.delta_t,
             "do_central_centered": self.central_centered,
             "do_testing": self.testing,
-            "do_restart": self.restart
+            "do_restart": self.restart,
+            "integrator": self.integrator,
+            "rtol": self.rtol,
+            "atol": self.atol,
+            "substeps": self.substeps,
+            "real_time_factor": self.real_time_factor,
+            "trail_length": self.trail_length,
+            "trail_angle": self.trail_angle,
+            "force": self.force,
+            "theta": self.theta
         }
 
     def save(self, path=None):
@@ -308,4 +522,4 @@ class Options:
         if path is None:
             path = dir_path + "/settings.yml"
         with open(path, "w+") as f:
-            f.write(yaml.dump(self.to_dict()))
+            f.write(yamlfile.dump(self.to_dict()))
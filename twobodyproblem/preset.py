@@ -1,9 +1,9 @@
 import os
 
-import yaml
+from twobodyproblem import yamlfile
 
 with open(os.path.dirname(os.path.realpath(__file__)) + "/saved_data/presets.yml") as f:
-    presets = yaml.load(f, Loader=yaml.FullLoader)
+    presets = yamlfile.load(f)
 
 
 class AstroBody:
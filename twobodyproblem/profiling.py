@@ -0,0 +1,114 @@
+"""Timing of the phases of a simulation loop
+
+The loop marks the end of each phase with FrameTimer.lap, so the time since the previous mark is
+added to that phase. Calls inside a phase, like the force computation of the integration, can be
+measured separately by wrapping them with FrameTimer.instrument.
+"""
+import collections
+import time
+
+PHASES = ("idle", "force", "integration", "collision", "drawing", "recording", "pointers")
+
+
+class FrameTimer:
+    """Per-phase wall times of the frames of a loop with rolling statistics
+
+    Attributes:
+    phases: Names of the measured phases
+    window: Number of recent frames used for the statistics
+    frames: Number of finished frames
+    log: Open file to which every frame is written as a CSV line, or None
+    """
+
+    def __init__(self, phases=PHASES, window=100, log=None):
+        """Initialize a FrameTimer, log is the path of a CSV file for all frames (default None)"""
+        self.phases = tuple(phases)
+        self.window = window
+        self.frames = 0
+        self.log = None
+        self._history = collections.deque(maxlen=window)
+        self._current = dict.fromkeys(self.phases, 0.0)
+        self._mark = time.perf_counter()
+        self._start = self._mark
+        if log is not None:
+            self.log = open(log, "w+")
+            self.log.write(",".join(("frame", "steps", "simulated_time", "total")
+                                    + self.phases) + "\n")
+
+    def lap(self, phase):
+        """Add the time since the last mark to phase and set a new mark"""
+        now = time.perf_counter()
+        self._current[phase] += now - self._mark
+        self._mark = now
+
+    def instrument(self, obj, name, phase, parent):
+        """Wrap the method name of obj so its time counts for phase instead of parent
+
+        The wrapper is stored on the instance only and removed with obj.__dict__.pop(name).
+        """
+        method = getattr(obj, name)
+        current = self._current
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                current[phase] += elapsed
+                current[parent] -= elapsed
+
+        setattr(obj, name, timed)
+
+    def end_frame(self, steps=0, simulated_time=0.0):
+        """Finish the current frame, which calculated steps steps covering simulated_time s"""
+        total = time.perf_counter() - self._start
+        times = tuple(self._current[phase] for phase in self.phases)
+        self._history.append((total, steps, simulated_time) + times)
+        if self.log is not None:
+            self.log.write(",".join(str(x) for x in (self.frames, steps, simulated_time, total)
+                                    + times) + "\n")
+        self.frames += 1
+        self.skip()
+
+    def skip(self):
+        """Discard the times of the current frame, e.g. while paused"""
+        for phase in self.phases:
+            self._current[phase] = 0.0
+        self._mark = time.perf_counter()
+        self._start = self._mark
+
+    def stats(self) -> dict:
+        """Return the statistics of the recent frames
+
+        The dictionary holds the mean and maximum time of each phase in s, the frames per second,
+        the calculated steps per second and the real-time factor (simulated per wall time).
+        """
+        if not self._history:
+            return {}
+        columns = list(zip(*self._history))
+        wall = sum(columns[0])
+        stats = {
+            "frames_per_second": len(self._history) / wall if wall > 0 else 0.0,
+            "steps_per_second": sum(columns[1]) / wall if wall > 0 else 0.0,
+            "real_time_factor": sum(columns[2]) / wall if wall > 0 else 0.0
+        }
+        for phase, column in zip(self.phases, columns[3:]):
+            stats[phase] = {"mean": sum(column) / len(column), "max": max(column)}
+        return stats
+
+    def text(self) -> str:
+        """Return the statistics as one line of text"""
+        stats = self.stats()
+        if not stats:
+            return ""
+        return "{:.0f} fps, {:.3g} steps/s, real-time factor {:.3g} | ".format(
+            stats["frames_per_second"], stats["steps_per_second"], stats["real_time_factor"]) \
+            + ", ".join("{} {:.2f} ms".format(phase, stats[phase]["mean"] * 1000)
+                        for phase in self.phases)
+
+    def close(self):
+        """Close the log file"""
+        if self.log is not None:
+            self.log.close()
+            self.log = None
@@ -0,0 +1,186 @@
+"""Recording of trajectories to memory-mapped .npy files
+
+A trajectory file is a regular .npy file with one structured record (t, pos, vel) per recorded
+step, so it can be opened zero-copy with numpy.load(path, mmap_mode="r"). The header has a fixed
+size, which lets the recorder grow the file and rewrite the number of records in place. Names,
+masses and radii of the bodies are stored in a small YAML file next to it.
+"""
+import os
+import time
+
+import numpy as np
+
+from twobodyproblem import yamlfile
+
+# size of the .npy header (magic string, version, length and padded dictionary) in bytes
+HEADER_SIZE = 256
+
+
+def record_dtype(n_bodies=2):
+    """Return the structured dtype of one record for n_bodies bodies"""
+    return np.dtype([("t", "<f8"), ("pos", "<f8", (n_bodies, 3)), ("vel", "<f8", (n_bodies, 3))])
+
+
+def metadata_path(path):
+    """Return the path of the YAML metadata file belonging to a trajectory file"""
+    return os.path.splitext(str(path))[0] + ".yml"
+
+
+def engine_metadata(engine, delta_t=None) -> dict:
+    """Return the names, masses and radii of the bodies of an Engine and delta_t as metadata"""
+    return {
+        "names": list(engine.names),
+        "mass": engine.mass.tolist(),
+        "radius": engine.radius.tolist(),
+        "delta_t": delta_t
+    }
+
+
+def save_metadata(path, n_bodies, every=1, metadata=None):
+    """Write the YAML metadata file belonging to a trajectory file
+
+    Arguments:
+    path: path of the trajectory file
+    n_bodies: number of bodies of a record
+    every: number of steps between two records (default 1)
+    metadata: further entries, e.g. from engine_metadata (default None)
+    """
+    meta = dict(metadata or {})
+    meta.update({"n_bodies": n_bodies, "every": every})
+    with open(metadata_path(path), "w+") as f:
+        f.write(yamlfile.dump(meta))
+
+
+def _header(dtype, count):
+    """Return the .npy header for count records, padded to HEADER_SIZE bytes"""
+    header = "{{'descr': {}, 'fortran_order': False, 'shape': ({},), }}".format(
+        repr(np.lib.format.dtype_to_descr(dtype)), count)
+    length = HEADER_SIZE - 10
+    if len(header) + 1 > length:
+        raise ValueError("too many bodies for the trajectory header")
+    return (np.lib.format.magic(1, 0) + length.to_bytes(2, "little")
+            + (header.ljust(length - 1) + "\n").encode("latin1"))
+
+
+class TrajectoryRecorder:
+    """Writes time, positions and velocities of the bodies to a growable memory-mapped file
+
+    Records are collected in a block in memory and copied to the mapped file when the block is
+    full or interval seconds have passed, the file is grown by doubling its capacity. Every flush
+    updates the number of records in the header, so the file of a killed process still holds the
+    records written until then.
+
+    Attributes:
+    path: Path of the .npy file
+    every: Record only every k-th call of record()
+    block_size: Number of records collected in memory before they are written
+    interval: Wall time in s after which collected records are written (None for full blocks only)
+    count: Number of records written to the file
+    """
+
+    def __init__(self, path, n_bodies=2, every=1, block_size=65536, capacity=None,
+                 metadata=None, interval=1.0):
+        """Create the file with room for capacity records (default block_size)
+
+        Arguments:
+        metadata: dictionary stored in the YAML metadata file (default None)
+        interval: wall time in s between two flushes (default 1.0, None for full blocks only)
+        """
+        if every < 1:
+            raise ValueError("every must be positive")
+        if interval is not None and interval < 0:
+            raise ValueError("interval must not be negative")
+        self.path = str(path)
+        self.every = every
+        self.block_size = block_size
+        self.interval = interval
+        self.count = 0
+        self._dtype = record_dtype(n_bodies)
+        self._block = np.empty(block_size, dtype=self._dtype)
+        self._filled = 0
+        self._calls = 0
+        self._flushed = time.monotonic()
+        self._capacity = max(capacity or block_size, 1)
+        self._file = open(self.path, "w+b")
+        self._file.write(_header(self._dtype, 0))
+        self._map = None
+        self._allocate(self._capacity)
+        save_metadata(self.path, n_bodies, every, metadata)
+
+    @classmethod
+    def for_engine(cls, path, engine, every=1, delta_t=None, **kwargs):
+        """Create TrajectoryRecorder with the names, masses and radii of an Engine as metadata"""
+        return cls(path, n_bodies=engine.pos.shape[0], every=every,
+                   metadata=engine_metadata(engine, delta_t), **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _allocate(self, capacity):
+        """Grow the file to capacity records and map its data part"""
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        self._file.truncate(HEADER_SIZE + capacity * self._dtype.itemsize)
+        self._capacity = capacity
+        self._map = np.memmap(self._file, dtype=self._dtype, mode="r+", offset=HEADER_SIZE,
+                              shape=(capacity,))
+
+    def record(self, engine):
+        """Record the current state of an Engine, if this is an every-th call"""
+        if self._calls % self.every == 0:
+            self.append(engine.t, engine.pos, engine.vel)
+        self._calls += 1
+
+    def append(self, t, pos, vel):
+        """Append one record with time, positions and velocities"""
+        record = self._block[self._filled]
+        record["t"] = t
+        record["pos"] = pos
+        record["vel"] = vel
+        self._filled += 1
+        if self._filled == self.block_size or (
+                self.interval is not None and time.monotonic() - self._flushed >= self.interval):
+            self.flush()
+
+    def flush(self):
+        """Write the collected records to the file and update the header"""
+        if self._filled:
+            end = self.count + self._filled
+            if end > self._capacity:
+                self._allocate(max(2 * self._capacity, end))
+            self._map[self.count:end] = self._block[:self._filled]
+            self.count = end
+            self._filled = 0
+        self._map.flush()
+        self._file.seek(0)
+        self._file.write(_header(self._dtype, self.count))
+        self._file.flush()
+        self._flushed = time.monotonic()
+
+    def close(self):
+        """Write the remaining records and cut the file to its content"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._map = None
+        self._file.truncate(HEADER_SIZE + self.count * self._dtype.itemsize)
+        self._file.close()
+
+
+def load_trajectory(path, mmap_mode="r"):
+    """Open a trajectory file, memory-mapped by default
+
+    The records have the fields t, pos and vel, e.g. load_trajectory(path)["pos"][:, 1] are the
+    positions of the satellite.
+    """
+    return np.load(str(path), mmap_mode=mmap_mode)
+
+
+def load_metadata(path) -> dict:
+    """Return the metadata of a trajectory file"""
+    with open(metadata_path(path), "r") as f:
+        return yamlfile.load(f)
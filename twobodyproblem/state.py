@@ -0,0 +1,138 @@
+"""Compact state of two bodies for fast stepping without arrays
+
+For two bodies the barycenter moves uniformly and the relative position follows
+r'' = -G(m1 + m2) r / |r|³. The semi-implicit Euler and leapfrog steps of the engine keep this
+split exactly, so only the six numbers of the relative orbit have to be stepped, as plain floats in
+local variables of one loop. The loop is compiled if Numba is installed, see
+twobodyproblem.compiled.
+"""
+import math
+
+from twobodyproblem import compiled
+from twobodyproblem.constants import G
+
+
+def _loop(rx, ry, rz, ux, uy, uz, mu, leapfrog, delta_t, steps, guard2):
+    """Step the relative orbit, return the new position, velocity and the number of steps"""
+    done = 0
+    if not leapfrog:
+        while done < steps:
+            r2 = rx * rx + ry * ry + rz * rz
+            if r2 < guard2:
+                break
+            k = -mu * delta_t / (r2 * math.sqrt(r2))
+            ux += k * rx
+            uy += k * ry
+            uz += k * rz
+            rx += ux * delta_t
+            ry += uy * delta_t
+            rz += uz * delta_t
+            done += 1
+    else:
+        half = delta_t / 2
+        r2 = rx * rx + ry * ry + rz * rz
+        k = -mu * half / (r2 * math.sqrt(r2))
+        while done < steps:
+            if r2 < guard2:
+                break
+            ux += k * rx
+            uy += k * ry
+            uz += k * rz
+            rx += ux * delta_t
+            ry += uy * delta_t
+            rz += uz * delta_t
+            r2 = rx * rx + ry * ry + rz * rz
+            k = -mu * half / (r2 * math.sqrt(r2))
+            ux += k * rx
+            uy += k * ry
+            uz += k * rz
+            done += 1
+    return rx, ry, rz, ux, uy, uz, done
+
+
+_compiled_loop = compiled.jit(_loop)
+
+
+class TwoBodyState:
+    """Relative orbit and barycenter of two bodies in plain floats
+
+    Attributes:
+    rx, ry, rz: Position of the satellite relative to the central body in m
+    ux, uy, uz: Velocity of the satellite relative to the central body in m/s
+    cx, cy, cz: Position of the barycenter in m
+    wx, wy, wz: Velocity of the barycenter in m/s
+    mu: Precomputed G(m1 + m2) in m³/s²
+    f0, f1: Mass fractions m1 / (m1 + m2) and m2 / (m1 + m2)
+    """
+    __slots__ = ("rx", "ry", "rz", "ux", "uy", "uz", "cx", "cy", "cz", "wx", "wy", "wz", "mu",
+                 "f0", "f1")
+
+    def __init__(self, mass, pos, vel):
+        """Initialize a TwoBodyState from masses, positions and velocities of the two bodies"""
+        m0, m1 = float(mass[0]), float(mass[1])
+        total = m0 + m1
+        self.mu = G * total
+        self.f0 = m0 / total
+        self.f1 = m1 / total
+        (x0, y0, z0), (x1, y1, z1) = pos
+        (vx0, vy0, vz0), (vx1, vy1, vz1) = vel
+        self.rx, self.ry, self.rz = float(x1 - x0), float(y1 - y0), float(z1 - z0)
+        self.ux, self.uy, self.uz = float(vx1 - vx0), float(vy1 - vy0), float(vz1 - vz0)
+        self.cx = float(self.f0 * x0 + self.f1 * x1)
+        self.cy = float(self.f0 * y0 + self.f1 * y1)
+        self.cz = float(self.f0 * z0 + self.f1 * z1)
+        self.wx = float(self.f0 * vx0 + self.f1 * vx1)
+        self.wy = float(self.f0 * vy0 + self.f1 * vy1)
+        self.wz = float(self.f0 * vz0 + self.f1 * vz1)
+
+    @classmethod
+    def from_engine(cls, engine):
+        """Create TwoBodyState from the current state of an Engine"""
+        return cls(engine.mass, engine.pos.tolist(), engine.vel.tolist())
+
+    def to_engine(self, engine):
+        """Write the positions and velocities of both bodies into the arrays of an Engine"""
+        pos = engine.pos
+        vel = engine.vel
+        pos[0, 0] = self.cx - self.f1 * self.rx
+        pos[0, 1] = self.cy - self.f1 * self.ry
+        pos[0, 2] = self.cz - self.f1 * self.rz
+        pos[1, 0] = self.cx + self.f0 * self.rx
+        pos[1, 1] = self.cy + self.f0 * self.ry
+        pos[1, 2] = self.cz + self.f0 * self.rz
+        vel[0, 0] = self.wx - self.f1 * self.ux
+        vel[0, 1] = self.wy - self.f1 * self.uy
+        vel[0, 2] = self.wz - self.f1 * self.uz
+        vel[1, 0] = self.wx + self.f0 * self.ux
+        vel[1, 1] = self.wy + self.f0 * self.uy
+        vel[1, 2] = self.wz + self.f0 * self.uz
+
+    def max_speed(self, distance):
+        """Return the largest relative speed possible at the given or a larger distance"""
+        energy = (0.5 * (self.ux * self.ux + self.uy * self.uy + self.uz * self.uz)
+                  - self.mu / math.sqrt(self.rx * self.rx + self.ry * self.ry + self.rz * self.rz))
+        return math.sqrt(max(2 * (energy + self.mu / distance), 0.0))
+
+    def run(self, integrator, delta_t, steps, guard=0.0):
+        """Calculate up to steps steps and return the number of calculated steps
+
+        Stops early before a step that starts closer than guard, so the caller can check that
+        step for a collision.
+
+        Arguments:
+        integrator: "euler" or "leapfrog"
+        delta_t: Δt value (seconds in one calculation)
+        steps: maximum number of steps
+        guard: distance below which no step is calculated (default 0.0)
+        """
+        if integrator not in ("euler", "leapfrog"):
+            raise ValueError("integrator must be euler or leapfrog")
+        loop = _compiled_loop if compiled.enabled and _compiled_loop is not None else _loop
+        self.rx, self.ry, self.rz, self.ux, self.uy, self.uz, done = loop(
+            self.rx, self.ry, self.rz, self.ux, self.uy, self.uz, self.mu,
+            integrator == "leapfrog", float(delta_t), int(steps), float(guard * guard))
+        time = done * delta_t
+        self.cx += self.wx * time
+        self.cy += self.wy * time
+        self.cz += self.wz * time
+        return done
@@ -0,0 +1,208 @@
+"""Parameter sweeps over the fields of Values
+
+A sweep expands ranges of Values fields into a grid of scenarios, splits the grid into chunks and
+calculates the chunks as ensembles on all cores. Finished chunks are stored in a directory, so an
+interrupted sweep continues where it stopped.
+"""
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from twobodyproblem import preset, yamlfile
+from twobodyproblem.ensemble import Ensemble
+from twobodyproblem.values import FIELDS, defaults
+
+RESULTS = ("distance_final", "energy", "min_distance", "collided", "collision_time")
+
+
+def _resolve(field, value):
+    """Replace preset names by their numbers, e.g. Earth for a mass or EarthSat for a distance"""
+    if not isinstance(value, str):
+        return float(value)
+    if field.endswith("_mass"):
+        return preset.mass(value)
+    if field.endswith("_radius"):
+        return preset.radius(value)
+    if field == "distance":
+        return preset.distance(value)
+    raise ValueError(field + " cannot be given by a preset name")
+
+
+def grid(**ranges) -> dict:
+    """Expand ranges of Values fields into a grid of all combinations
+
+    Every keyword is a field of FIELDS with a number or a sequence of numbers or preset names.
+    The keywords central and sat take preset body names and set mass and radius together. Fields
+    that are not given keep the default of Values.
+
+    Returns a dictionary with an array for every field of FIELDS.
+    """
+    axes = []
+    for name, value in ranges.items():
+        values = [value] if isinstance(value, str) or np.ndim(value) == 0 else list(value)
+        if name in ("central", "sat"):
+            axes.append({name + "_mass": [preset.mass(v) for v in values],
+                         name + "_radius": [preset.radius(v) for v in values]})
+        elif name in FIELDS:
+            axes.append({name: [_resolve(name, v) for v in values]})
+        else:
+            raise ValueError("unknown field " + name)
+    lengths = [len(next(iter(axis.values()))) for axis in axes]
+    index = np.meshgrid(*(np.arange(n) for n in lengths), indexing="ij")
+    size = int(np.prod(lengths)) if lengths else 1
+    table = {field: np.full(size, float(default)) for field, default in zip(FIELDS, defaults)}
+    for axis, i in zip(axes, index):
+        for field, column in axis.items():
+            table[field] = np.asarray(column, dtype=float)[i.ravel()]
+    return table
+
+
+def _run_chunk(columns, steps, delta_t, integrator):
+    """Calculate one chunk of a sweep as an ensemble and return its result columns"""
+    ensemble = Ensemble.from_arrays(
+        central_mass=columns["central_mass"], central_radius=columns["central_radius"],
+        sat_mass=columns["sat_mass"], sat_radius=columns["sat_radius"],
+        distance=columns["distance"],
+        central_v0=np.stack([columns["central_v0_" + c] for c in "xyz"], axis=1),
+        sat_v0=np.stack([columns["sat_v0_" + c] for c in "xyz"], axis=1),
+        integrator=integrator).run(steps, delta_t)
+    results = ensemble.results()
+    results["distance_final"] = results.pop("distance")
+    return {name: results[name] for name in RESULTS}
+
+
+class Sweep:
+    """Runs a grid of scenarios in chunks on a process pool
+
+    Attributes:
+    table: Dictionary with an array for every field of FIELDS, e.g. made by grid()
+    steps: Number of steps calculated for every scenario
+    delta_t: Δt value (seconds in one calculation)
+    integrator: Name of the (fixed step) integrator
+    chunk_size: Number of scenarios per chunk
+    directory: Directory for the finished chunks (None to keep nothing on disk)
+    """
+
+    def __init__(self, table, steps, delta_t=10, integrator="leapfrog", chunk_size=1000,
+                 directory=None):
+        """Initialize a Sweep, checking a resumed directory against the parameters"""
+        self.table = {field: np.asarray(table[field], dtype=float) for field in FIELDS}
+        self.steps = steps
+        self.delta_t = delta_t
+        self.integrator = integrator
+        self.chunk_size = chunk_size
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._check_directory()
+
+    def __len__(self):
+        return self.table["distance"].size
+
+    @property
+    def chunks(self):
+        """Get the number of chunks"""
+        return -(-len(self) // self.chunk_size)
+
+    def _parameters(self) -> dict:
+        """Return the parameters a resumed sweep must agree with, including a hash of the table"""
+        digest = hashlib.sha256()
+        for field in FIELDS:
+            digest.update(np.ascontiguousarray(self.table[field], dtype="<f8").tobytes())
+        return {
+            "table": digest.hexdigest(),
+            "scenarios": len(self),
+            "steps": int(self.steps),
+            "delta_t": float(self.delta_t),
+            "integrator": self.integrator,
+            "chunk_size": int(self.chunk_size)
+        }
+
+    def _check_directory(self):
+        """Write the sweep parameters or check them against those of an earlier run"""
+        path = os.path.join(self.directory, "sweep.yml")
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                if yamlfile.load(f) != self._parameters():
+                    raise ValueError("directory contains a sweep with other parameters")
+        else:
+            with open(path, "w+") as f:
+                f.write(yamlfile.dump(self._parameters()))
+
+    def _chunk_path(self, i):
+        """Return the path of the file of chunk i"""
+        return os.path.join(self.directory, "chunk_{:06d}.npz".format(i))
+
+    def _chunk_columns(self, i):
+        """Return the input columns of chunk i"""
+        part = slice(i * self.chunk_size, (i + 1) * self.chunk_size)
+        return {field: column[part] for field, column in self.table.items()}
+
+    def _store(self, i, results):
+        """Store the results of chunk i atomically"""
+        tmp = self._chunk_path(i) + ".tmp.npz"
+        np.savez(tmp, **results)
+        os.replace(tmp, self._chunk_path(i))
+
+    def run(self, workers=None, progress=True) -> dict:
+        """Calculate all missing chunks and return the table with the result columns
+
+        Arguments:
+        workers: number of processes (default number of cores, 1 to calculate in this process)
+        progress: print the progress to stderr (default True)
+        """
+        results = [None] * self.chunks
+        todo = []
+        for i in range(self.chunks):
+            if self.directory is not None and os.path.isfile(self._chunk_path(i)):
+                with np.load(self._chunk_path(i)) as f:
+                    results[i] = {name: f[name] for name in RESULTS}
+            else:
+                todo.append(i)
+        start = time.perf_counter()
+        done = 0
+        scenarios = 0
+
+        def finish(i, result):
+            nonlocal done, scenarios
+            results[i] = result
+            if self.directory is not None:
+                self._store(i, result)
+            done += 1
+            scenarios += result["energy"].size
+            if progress:
+                elapsed = time.perf_counter() - start
+                print("\rchunk {}/{} done, {:.0f} scenarios/s".format(
+                    self.chunks - len(todo) + done, self.chunks,
+                    scenarios / elapsed if elapsed > 0 else 0), end="", file=sys.stderr,
+                    flush=True)
+
+        if workers == 1:
+            for i in todo:
+                finish(i, _run_chunk(self._chunk_columns(i), self.steps, self.delta_t,
+                                     self.integrator))
+        elif todo:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(_run_chunk, self._chunk_columns(i), self.steps,
+                                           self.delta_t, self.integrator): i for i in todo}
+                for future in as_completed(futures):
+                    finish(futures[future], future.result())
+        if progress and todo:
+            print(file=sys.stderr)
+
+        table = dict(self.table)
+        for name in RESULTS:
+            table[name] = np.concatenate([result[name] for result in results]) if results \
+                else np.empty(0)
+        return table
+
+
+def save_table(table: dict, path):
+    """Save a result table as CSV with a header line of the column names"""
+    names = list(table)
+    np.savetxt(path, np.column_stack([np.asarray(table[name], dtype=float) for name in names]),
+               delimiter=",", header=",".join(names), comments="")
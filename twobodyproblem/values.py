@@ -1,10 +1,13 @@
 import os
 from pathlib import Path
 
-import vpython as vp
-import yaml
+from twobodyproblem import yamlfile
+from twobodyproblem.vector import Vector
 
 defaults = (5.972e+24, 6371000.0, 0.0, 0.0, 0.0, 500.0, 2.0, 0.0, 0.0, -8000.0, 1000000.0)
+# flat names of the fields in the order of Values.from_list and Values.to_list
+FIELDS = ("central_mass", "central_radius", "central_v0_x", "central_v0_y", "central_v0_z",
+          "sat_mass", "sat_radius", "sat_v0_x", "sat_v0_y", "sat_v0_z", "distance")
 
 
 class Values:
@@ -14,6 +17,7 @@ class Values:
     central: The central Body, usually the more massive one
     sat: The second Body (satellite)
     distance: Starting distance between the two bodies
+    others: List of additional Body objects with their own starting positions
     """
 
     class Body:
@@ -23,13 +27,16 @@ class Values:
         mass: The mass of the body in kg
         radius: The radius of the body in m
         velocity: The velocity of the body in m/s in x, y, z directions
+        position: The starting position of the body in m in x, y, z directions (only used for
+            additional bodies, central and sat are placed by distance)
         """
 
-        def __init__(self, mass, radius, v0_x=0.0, v0_y=0.0, v0_z=0.0):
-            """Initialize a Body with an initial velocity v0 in x, y, z"""
+        def __init__(self, mass, radius, v0_x=0.0, v0_y=0.0, v0_z=0.0, x=0.0, y=0.0, z=0.0):
+            """Initialize a Body with an initial velocity v0 and position in x, y, z"""
             self.mass = mass
             self.radius = radius
-            self.velocity = vp.vector(v0_x, v0_y, v0_z)
+            self.velocity = Vector(v0_x, v0_y, v0_z)
+            self.position = Vector(x, y, z)
 
         @property
         def mass(self):
@@ -63,21 +70,54 @@ class Values:
             return self._velocity
 
         @velocity.setter
-        def velocity(self, value: vp.vector):
-            if not isinstance(value, vp.vector):
-                raise TypeError("velocity must be a vector")
-            self._velocity = value
+        def velocity(self, value: Vector):
+            self._velocity = Vector.convert(value, "velocity")
+
+        @property
+        def position(self):
+            """Get and set starting position"""
+            return self._position
+
+        @position.setter
+        def position(self, value: Vector):
+            self._position = Vector.convert(value, "position")
+
+        @classmethod
+        def from_dict(cls, values: dict):
+            """Create Body from dictionary as in the others list of Values.to_dict"""
+            return cls(mass=values["mass"], radius=values["radius"], v0_x=values["v0"]["x"],
+                       v0_y=values["v0"]["y"], v0_z=values["v0"]["z"],
+                       x=values["position"]["x"], y=values["position"]["y"],
+                       z=values["position"]["z"])
+
+        def to_dict(self) -> dict:
+            """Convert the Body to a dictionary as in the others list of Values.to_dict"""
+            return {
+                "mass": self.mass,
+                "radius": self.radius,
+                "position": {
+                    "x": self.position.x,
+                    "y": self.position.y,
+                    "z": self.position.z
+                },
+                "v0": {
+                    "x": self.velocity.x,
+                    "y": self.velocity.y,
+                    "z": self.velocity.z
+                }
+            }
 
     def __init__(self, central_mass=defaults[0], central_radius=defaults[1],
                  central_v0_x=defaults[2], central_v0_y=defaults[3], central_v0_z=defaults[4],
                  sat_mass=defaults[5], sat_radius=defaults[6], sat_v0_x=defaults[7],
-                 sat_v0_y=defaults[8], sat_v0_z=defaults[9], distance=defaults[10]):
-        """Initialize a Values object with the details for central and sat bodies"""
+                 sat_v0_y=defaults[8], sat_v0_z=defaults[9], distance=defaults[10], others=()):
+        """Initialize a Values object with the details for central, sat and other bodies"""
         self.central = self.Body(mass=central_mass, radius=central_radius, v0_x=central_v0_x,
                                  v0_y=central_v0_y, v0_z=central_v0_z)
         self.sat = self.Body(mass=sat_mass, radius=sat_radius, v0_x=sat_v0_x, v0_y=sat_v0_y,
                              v0_z=sat_v0_z)
         self.distance = distance
+        self.others = list(others)
 
     @classmethod
     def from_dict(cls, values: dict):
@@ -87,7 +127,8 @@ class Values:
                    central_v0_z=values["central_v0"]["z"], sat_mass=values["sat_mass"],
                    sat_radius=values["sat_radius"], sat_v0_x=values["sat_v0"]["x"],
                    sat_v0_y=values["sat_v0"]["y"], sat_v0_z=values["sat_v0"]["z"],
-                   distance=values["distance"])
+                   distance=values["distance"],
+                   others=[cls.Body.from_dict(other) for other in values.get("others", [])])
 
     @classmethod
     def from_list(cls, values):
@@ -111,7 +152,7 @@ class Values:
         if path is None:
             path = dir_path + "/values.yml"
         with open(path, "r") as f:
-            return cls.from_dict(yaml.load(f, Loader=yaml.FullLoader))
+            return cls.from_dict(yamlfile.load(f))
 
     @classmethod
     def from_input(cls):
@@ -165,8 +206,28 @@ class Values:
             values[10] = float(input("\tInitial distance (1000000)[m]: "))
         except ValueError:
             pass
+        try:
+            count = int(input("Number of additional bodies (0): "))
+        except ValueError:
+            count = 0
+        others = []
+        for i in range(count):
+            print("Additional body " + str(i + 1) + " (all values required):")
+            try:
+                others.append(cls.Body(
+                    mass=float(input("\tMass [kg]: ")), radius=float(input("\tRadius [m]: ")),
+                    x=float(input("\tPosition in x [m]: ")),
+                    y=float(input("\tPosition in y [m]: ")),
+                    z=float(input("\tPosition in z [m]: ")),
+                    v0_x=float(input("\tSpeed in x [m/s]: ")),
+                    v0_y=float(input("\tSpeed in y [m/s]: ")),
+                    v0_z=float(input("\tSpeed in z [m/s]: "))))
+            except ValueError:
+                print("\tInvalid input, body skipped")
 
-        return cls.from_list(values)
+        values = cls.from_list(values)
+        values.others = others
+        return values
 
     @property
     def distance(self):
@@ -179,6 +240,27 @@ class Values:
             raise TypeError("distance must be a number")
         self._distance = value
 
+    @property
+    def bodies(self):
+        """Get all bodies: central, sat and the others"""
+        return [self.central, self.sat] + self.others
+
+    def positions(self):
+        """Return the starting positions of all bodies as tuples of x, y, z
+
+        The central body starts at the origin, the satellite on the x axis with the given distance
+        between the surfaces of the two bodies.
+        """
+        sat_x = self.distance + self.central.radius + self.sat.radius
+        return [(0.0, 0.0, 0.0), (sat_x, 0.0, 0.0)] \
+            + [(other.position.x, other.position.y, other.position.z) for other in self.others]
+
+    def to_list(self) -> list:
+        """Convert the Values object to a list in the order of FIELDS, without the others"""
+        return [self.central.mass, self.central.radius, self.central.velocity.x,
+                self.central.velocity.y, self.central.velocity.z, self.sat.mass, self.sat.radius,
+                self.sat.velocity.x, self.sat.velocity.y, self.sat.velocity.z, self.distance]
+
     def to_dict(self) -> dict:
         """Converts the Values object to a dictionary"""
         return {
@@ -196,7 +278,8 @@ class Values:
                 "y": self.sat.velocity.y,
                 "z": self.sat.velocity.z
             },
-            "distance": self.distance
+            "distance": self.distance,
+            "others": [other.to_dict() for other in self.others]
         }
 
     def save(self, path=None):
@@ -212,4 +295,4 @@ class Values:
         if path is None:
             path = dir_path + "/values.yml"
         with open(path, "w+") as f:
-            f.write(yaml.dump(self.to_dict()))
+            f.write(yamlfile.dump(self.to_dict()))
@@ -0,0 +1,40 @@
+class Vector:
+    """Plain x, y, z container for the configuration, free of vpython
+
+    The visualization converts it to a vpython vector where needed, see
+    twobodyproblem.visualization.body.to_vpython.
+
+    Attributes:
+    x, y, z: The components of the vector
+    """
+    __slots__ = ("x", "y", "z")
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        """Initialize a Vector with components x, y and z"""
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @classmethod
+    def convert(cls, value, name="vector"):
+        """Return value as a Vector, also accepting objects with x, y, z like vpython vectors
+
+        Raises TypeError for anything else, name is used in the message.
+        """
+        if isinstance(value, cls):
+            return value
+        try:
+            return cls(value.x, value.y, value.z)
+        except AttributeError:
+            raise TypeError(name + " must be a vector") from None
+
+    def __iter__(self):
+        return iter((self.x, self.y, self.z))
+
+    def __eq__(self, other):
+        if not isinstance(other, Vector):
+            return NotImplemented
+        return (self.x, self.y, self.z) == (other.x, other.y, other.z)
+
+    def __repr__(self):
+        return "Vector({}, {}, {})".format(self.x, self.y, self.z)
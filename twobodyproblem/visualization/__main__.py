@@ -7,16 +7,21 @@ import argparse
 import sys
 
 import twobodyproblem
+from twobodyproblem.constants import FORCE_NAMES, INTEGRATOR_NAMES
 from twobodyproblem.options import Options
 from twobodyproblem.values import Values
-from twobodyproblem.visualization.simulation import run_simulation
 
 if __name__ == "__main__":
     # add CLI arguments
     parser = argparse.ArgumentParser(
         prog="twobodyproblem",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter,
-        usage="python -m twobodyproblem.visualization [-h | -v] -i values [-o options] [-d]",
+        usage="python -m twobodyproblem.visualization [-h | -v] -i values [-o options] "
+              "[--integrator name] [--rtol rtol] [--atol atol] [--record file "
+              "[--record-every k]] [--replay file [--speed s]] [--substeps n | "
+              "--real-time-factor f] [--trail-length n] [--trail-angle a] [--force name] "
+              "[--theta θ] [--profile] [--profile-log file] [--checkpoint file "
+              "[--checkpoint-every s]] [--resume file] [--process] [--events file] [-d]",
         description="This is a little simulation of the gravitational two body problem.\nTo use "
                     "it normally in CLI mode, just run the command without any of the optional "
                     "arguments.",
@@ -29,7 +34,7 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "-d", "--debug", action="store_true",
-        help="Run the program in debug mode"
+        help="Run the program in debug mode, also writes the frame timings to --profile-log"
     )
     parser.add_argument(
         "-i", "--input", nargs="*",
@@ -48,6 +53,88 @@ if __name__ == "__main__":
              "testing features, restart after simulation",
         metavar="options", type=int
     )
+    parser.add_argument(
+        "--integrator", default="leapfrog", choices=INTEGRATOR_NAMES,
+        help="The integrator used for the physical calculations"
+    )
+    parser.add_argument(
+        "--rtol", default=1e-9, type=float,
+        help="Relative tolerance of the adaptive integrator dopri5"
+    )
+    parser.add_argument(
+        "--atol", default=1e-6, type=float,
+        help="Absolute tolerance of the adaptive integrator dopri5"
+    )
+    parser.add_argument(
+        "--record", metavar="file",
+        help="Record the trajectory to a .npy file, after every restart to a new numbered file "
+             "(file-1.npy, ...)"
+    )
+    parser.add_argument(
+        "--record-every", default=1, type=int, metavar="k",
+        help="Record only every k-th frame"
+    )
+    parser.add_argument(
+        "--replay", metavar="file",
+        help="Play a recorded trajectory file instead of calculating the simulation"
+    )
+    parser.add_argument(
+        "--speed", default=1.0, type=float, metavar="s",
+        help="Number of records played per frame in replay mode"
+    )
+    parser.add_argument(
+        "--substeps", default=1, type=int, metavar="n",
+        help="Number of calculations per rendered frame"
+    )
+    parser.add_argument(
+        "--real-time-factor", default=0.0, type=float, metavar="f",
+        help="Simulated seconds per real second, sets the calculations per frame automatically "
+             "(0 to use --substeps)"
+    )
+    parser.add_argument(
+        "--trail-length", default=2000, type=int, metavar="n",
+        help="Maximum number of points of each trail (0 for unlimited)"
+    )
+    parser.add_argument(
+        "--trail-angle", default=1.0, type=float, metavar="a",
+        help="Minimum bend in degrees for a new trail point (0 to keep every point)"
+    )
+    parser.add_argument(
+        "--force", default="direct", choices=FORCE_NAMES,
+        help="The force kernel used for more than two bodies"
+    )
+    parser.add_argument(
+        "--theta", default=0.5, type=float, metavar="θ",
+        help="Opening angle of the Barnes-Hut force kernel"
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Show the times of the phases of each frame below the canvas"
+    )
+    parser.add_argument(
+        "--profile-log", default="profile.csv", metavar="file",
+        help="CSV file for the times of every frame in debug mode"
+    )
+    parser.add_argument(
+        "--checkpoint", metavar="file",
+        help="Save the state of the simulation regularly to a checkpoint file"
+    )
+    parser.add_argument(
+        "--checkpoint-every", default=5.0, type=float, metavar="s",
+        help="Wall time in seconds between two checkpoints"
+    )
+    parser.add_argument(
+        "--resume", metavar="file",
+        help="Continue the simulation from a checkpoint file, whose values replace -i"
+    )
+    parser.add_argument(
+        "--process", action="store_true",
+        help="Calculate the physics in a separate process, independent of the drawing"
+    )
+    parser.add_argument(
+        "--events", metavar="file",
+        help="Detect periapsis, apoapsis and escape and write the event log to a CSV file"
+    )
     args = parser.parse_args()
 
     # convert inputs to usable objects
@@ -61,6 +148,15 @@ if __name__ == "__main__":
         raise ValueError("please provide more options")
     values = Values.from_list(args.input)
     options = Options.from_list(args.options)
+    options.integrator = args.integrator
+    options.rtol = args.rtol
+    options.atol = args.atol
+    options.substeps = args.substeps
+    options.real_time_factor = args.real_time_factor
+    options.trail_length = args.trail_length
+    options.trail_angle = args.trail_angle
+    options.force = args.force
+    options.theta = args.theta
 
     if args.debug:
         print("Debugging activated...")
@@ -71,5 +167,15 @@ if __name__ == "__main__":
         print("Options:", end=" ")
         print(options.to_dict())
 
-    # start simulation
-    run_simulation(values=values, options=options)
+    # start replay or simulation, imported only now so worker processes do not import vpython
+    if args.replay is not None:
+        from twobodyproblem.visualization.replay import run_replay
+        run_replay(args.replay, options=options, speed=args.speed)
+    else:
+        from twobodyproblem.visualization.simulation import run_simulation
+        run_simulation(values=values, options=options, record=args.record,
+                       record_every=args.record_every, profile=args.profile or args.debug,
+                       profile_log=args.profile_log if args.debug else None,
+                       checkpoint=args.checkpoint, checkpoint_every=args.checkpoint_every,
+                       resume=args.resume, process=args.process,
+                       events=args.events)
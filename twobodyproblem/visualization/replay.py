@@ -0,0 +1,124 @@
+import math
+import os
+import signal
+import time
+
+import vpython as vp
+
+from twobodyproblem.options import Options
+from twobodyproblem.recorder import load_metadata, load_trajectory
+from twobodyproblem.visualization.body import Body, to_vpython
+from twobodyproblem.visualization.trail import Trail
+
+
+def run_replay(path, options: Options = Options(), speed=1.0):
+    """Open the vpython window and play a recorded trajectory without calculating anything
+
+    The shown record follows the wall clock, so records are skipped when drawing is slower than
+    the playback speed.
+
+    Arguments:
+    path: path of the trajectory file
+    options: Options object required for adjusting the canvas, colors and rate
+    speed: number of records played per frame at options.rate frames per second (default 1.0)
+    """
+    if not isinstance(options, Options):
+        raise TypeError("options must be of type Options")
+    if speed <= 0:
+        raise ValueError("speed must be positive")
+    records = load_trajectory(path)
+    metadata = load_metadata(path)
+    if records.shape[0] == 0:
+        raise ValueError("the trajectory file is empty")
+    names = metadata.get("names") or ["body" + str(i) for i in range(metadata["n_bodies"])]
+    radii = metadata.get("radius") or [1.0] * metadata["n_bodies"]
+
+    index = 0.0
+    start = (time.perf_counter(), index)
+
+    def pause(button: vp.button):
+        """Pause and un-pause the replay
+
+        Arguments:
+        button: Pause vpython button itself
+        """
+        nonlocal index, start
+        if button.text == "Pause":
+            button.text = "Play"
+        else:
+            button.text = "Pause"
+            if index >= records.shape[0] - 1:
+                # play again from the beginning
+                index = 0.0
+                for trail in trails:
+                    trail.clear()
+            start = (time.perf_counter(), index)
+
+    def seek(slider: vp.slider):
+        """Jump to the record chosen with the slider"""
+        nonlocal index, start
+        index = float(slider.value)
+        start = (time.perf_counter(), index)
+        for trail in trails:
+            trail.clear()
+        draw()
+
+    def change_speed(field: vp.winput):
+        """Change the playback speed according to winput field number"""
+        nonlocal speed, start
+        if field.number is not None and field.number > 0:
+            speed = field.number
+            start = (time.perf_counter(), index)
+
+    def draw():
+        """Move the bodies and pointers to the current record"""
+        record = records[int(index)]
+        for body, trail, ptr, pos in zip(bodies, trails, pointers, record["pos"]):
+            body.show(pos)
+            trail.add(body.pos)
+            if options.pointers:
+                ptr.pos = body.pos - ptr.axis + vp.vector(0, body.radius, 0)
+        time_text.text = " t = {:.1f} s".format(record["t"])
+        position.value = int(index)
+
+    # set up canvas, bodies and pointers
+    scene = vp.canvas(title="Wiedergabe zum Zweikörperproblem", height=options.canvas.height,
+                      width=options.canvas.width)
+    first = records[0]["pos"]
+    length = max(float(sum((first[-1] - first[0]) ** 2) ** 0.5), max(radii)) / 2
+    bodies = []
+    trails = []
+    pointers = []
+    for name, radius, pos in zip(names, radii, first):
+        bodies.append(Body(name=name, radius=radius, pos=vp.vector(*pos), make_trail=False,
+                           color=to_vpython(options.colors.bodies, 1 / 255)))
+        trails.append(Trail(max_points=options.trail_length,
+                            min_angle=math.radians(options.trail_angle), min_distance=radius,
+                            color=bodies[-1].color))
+        pointers.append(vp.arrow(axis=vp.vector(0, -length, 0),
+                                 color=to_vpython(options.colors.pointers),
+                                 visible=options.pointers))
+
+    # set up buttons, slider and text fields
+    pause_replay = vp.button(text="Play", bind=pause)
+    vp.button(text="Stop", bind=lambda: os.kill(os.getpid(), signal.SIGINT))
+    time_text = vp.wtext(text="")
+    scene.append_to_caption("\n")
+    position = vp.slider(min=0, max=max(records.shape[0] - 1, 1), value=0, step=1, top=12,
+                         bottom=12, bind=seek)
+    scene.append_to_caption("\n")
+    vp.wtext(text="Speed [records per frame]: ")
+    vp.winput(text=speed, bind=change_speed)
+    draw()
+
+    # main replay loop
+    if options.central_centered:
+        scene.camera.follow(bodies[0])
+    while True:
+        vp.rate(options.rate)
+        if pause_replay.text == "Pause":
+            index = start[1] + (time.perf_counter() - start[0]) * options.rate * speed
+            if index >= records.shape[0] - 1:
+                index = records.shape[0] - 1
+                pause_replay.text = "Play"
+            draw()
@@ -1,23 +1,62 @@
+import math
 import os
 import signal
-import sys
 
 import vpython as vp
 
+from twobodyproblem.checkpoint import Checkpointer, load_checkpoint
+from twobodyproblem.engine import Engine
+from twobodyproblem.events import EventDetector
 from twobodyproblem.options import Options
+from twobodyproblem.profiling import FrameTimer
+from twobodyproblem.recorder import TrajectoryRecorder
 from twobodyproblem.values import Values
-from twobodyproblem.visualization.body import Body
+from twobodyproblem.visualization.body import Body, to_vpython
+from twobodyproblem.visualization.trail import Trail
+from twobodyproblem.worker import COLLIDED, FAILED, PhysicsWorker
 
 
-def run_simulation(values: Values = Values(), options: Options = Options()):
+def run_simulation(values: Values = Values(), options: Options = Options(), record=None,
+                   record_every=1, profile=False, profile_log=None, on_restart=None,
+                   checkpoint=None, checkpoint_every=5.0, resume=None, process=False,
+                   events=None):
     """Open the vpython window and start the simulation
-    
+
+    Restarting resets the simulation on the same canvas, without starting a new program.
+
     Arguments:
     values: Values object with physical values required for simulation
     options: Options object required for adjusting simulation
+    record: path of a trajectory file to record the simulation to, every restart records to a
+    new file with a number appended, e.g. run-1.npy after run.npy (default None)
+    record_every: record only every k-th frame (default 1)
+    profile: time the phases of every frame and show the statistics below the canvas (default
+    False)
+    profile_log: path of a CSV file to which the times of every frame are written (default None)
+    on_restart: function called on every restart, returning new Values or None to keep the
+    current ones (default None)
+    checkpoint: path of a file to which the state is saved regularly and at the end (default
+    None)
+    checkpoint_every: wall time in s between two checkpoints (default 5.0)
+    resume: path of a checkpoint to continue from, its values and integrator settings replace
+    the given ones (default None)
+    process: calculate the physics in a worker process at rate times steps per frame
+    calculations per second, independent of the drawing (default False)
+    events: path of a CSV file for the log of periapsis, apoapsis and escape events, which are
+    also shown below the canvas (default None, not together with process)
     """
     if not isinstance(values, Values) or not isinstance(options, Options):
         raise TypeError("values must be of type Values, options must be of type Options")
+    if process and events is not None:
+        raise ValueError("events cannot be detected in a worker process")
+
+    resumed = None
+    t = 0
+    if resume is not None:
+        resumed, saved_values, extra = load_checkpoint(resume)
+        if saved_values is not None:
+            values = saved_values
+        t = extra.get("frames", 0)
 
     collision_detection = True
 
@@ -31,12 +70,46 @@ def run_simulation(values: Values = Values(), options: Options = Options()):
             button.text = "Play"
         else:
             button.text = "Pause"
+        if worker is not None:
+            worker.send("pause", button.text != "Pause")
+
+    def restart(new_values: Values = None):
+        """Reset engine, bodies, trails, pointers, sliders and counters to the start
 
-    def restart():
-        """Restart the program"""
-        # does not work perfectly, especially on command line
-        os.execl(sys.executable, sys.executable, *sys.argv)
-        # os.execv(sys.executable, ["python"] + sys.argv)
+        The finished recording is kept and the next run is recorded to a new numbered file.
+
+        Arguments:
+        new_values: Values object to simulate from now on (default None to ask on_restart or to
+            keep the current values)
+        """
+        nonlocal values, engine, recorder, recordings, worker, detector, t
+        if new_values is None and on_restart is not None:
+            new_values = on_restart()
+        if new_values is not None:
+            if not isinstance(new_values, Values):
+                raise TypeError("new_values must be of type Values")
+            values = new_values
+        engine = make_engine()
+        if recorder is not None:
+            recorder.close()
+            recordings += 1
+            recorder = make_recorder()
+        if worker is not None:
+            worker.stop()
+            worker = make_worker()
+        if detector is not None:
+            detector = make_detector()
+            event_text.text = ""
+        place_bodies()
+        for slider, body in ((central_slider, values.central), (sat_slider, values.sat)):
+            slider.max = (values.distance + body.radius) / body.radius
+            slider.value = 1
+        pause_sim.text = "Play"
+        t = 0
+        if timer is not None:
+            timer.skip()
+        if checkpointer is not None:
+            checkpointer.values = values
 
     def switch_collision_detection(button: vp.button):
         """Activate and deactivate collision detection"""
@@ -45,14 +118,27 @@ def run_simulation(values: Values = Values(), options: Options = Options()):
             collision_detection = True
         else:
             collision_detection = False
+        if worker is not None:
+            worker.send("collision_detection", collision_detection)
 
     def change_rate(field: vp.winput):
         """Change the rate according to winput field number"""
         options.rate = field.number
+        if worker is not None:
+            worker.send("steps_per_second", options.steps_per_frame() * options.rate)
 
     def change_delta_t(field: vp.winput):
         """Change the Δt factor according to winput field number"""
         options.delta_t = field.number
+        if worker is not None:
+            worker.send("delta_t", options.delta_t)
+            worker.send("steps_per_second", options.steps_per_frame() * options.rate)
+
+    def change_substeps(field: vp.winput):
+        """Change the number of calculations per frame according to winput field number"""
+        options.substeps = int(field.number)
+        if worker is not None:
+            worker.send("steps_per_second", options.steps_per_frame() * options.rate)
 
     def adjust_radius(slider: vp.slider, sphere: Body):
         """Adjust the visual size of the body according to the slider value
@@ -69,44 +155,134 @@ def run_simulation(values: Values = Values(), options: Options = Options()):
         slider.value = 1
         slider.bind()
 
-    # set up canvas, bodies and pointers
+    def make_engine():
+        """Create the engine for the current values (or the resumed one), timed if profiling
+
+        The engine of a worker process is not timed, as the timed methods cannot be pickled.
+        """
+        nonlocal resumed
+        if resumed is not None:
+            new, resumed = resumed, None
+        else:
+            new = Engine.from_values(values, integrator=options.integrator, rtol=options.rtol,
+                                     atol=options.atol, force=options.force, theta=options.theta)
+        if timer is not None and not process:
+            # the fast path of two bodies computes the forces inline, they count as integration
+            timer.instrument(new, "acceleration", "force", "integration")
+            timer.instrument(new, "sweep_collision", "collision", "integration")
+            timer.instrument(new, "collisions", "collision", "integration")
+        return new
+
+    def make_recorder():
+        """Create the recorder and record the start, or return None without recording"""
+        if record is None:
+            return None
+        path = record
+        if recordings > 0:
+            root, extension = os.path.splitext(str(record))
+            path = "{}-{}{}".format(root, recordings, extension)
+        new = TrajectoryRecorder.for_engine(path, engine, every=record_every,
+                                            delta_t=options.delta_t)
+        new.record(engine)
+        return new
+
+    def make_worker():
+        """Start the worker process for the engine, or return None without one"""
+        if not process:
+            return None
+        return PhysicsWorker(engine, delta_t=options.delta_t,
+                             steps_per_second=options.steps_per_frame() * options.rate,
+                             collision_detection=collision_detection, checkpoint=checkpoint,
+                             checkpoint_every=checkpoint_every, values=values)
+
+    def make_detector():
+        """Create the event detector, or return None without an event log"""
+        if events is None:
+            return None
+        return EventDetector(on_event=show_event)
+
+    def show_event(event):
+        """Show the latest event with the derived period and eccentricity below the canvas"""
+        text = " {}: t = {:.1f} s, distance = {:.6g} m, speed = {:.6g} m/s".format(
+            event.kind.capitalize(), event.t, event.distance, event.speed)
+        if detector is not None and detector.period() is not None:
+            text += ", period = {:.6g} s".format(detector.period())
+        if detector is not None and detector.eccentricity() is not None:
+            text += ", eccentricity = {:.4f}".format(detector.eccentricity())
+        event_text.text = text
+
+    def place_bodies():
+        """Put bodies, trails and pointers of the current values at the start positions
+
+        Spheres of additional bodies are reused, missing ones are created and surplus ones hidden.
+        """
+        for body, trail, data, pos in zip(bodies, trails, values.bodies, engine.pos):
+            body.mass = data.mass
+            body.radius = data.radius
+            body.show(pos)
+            body.visible = True
+            trail.min_distance = data.radius
+        for i in range(len(bodies), engine.pos.shape[0]):
+            data = values.bodies[i]
+            bodies.append(Body(name=engine.names[i], mass=data.mass,
+                               pos=vp.vector(*engine.pos[i]), radius=data.radius,
+                               make_trail=False,
+                               color=to_vpython(options.colors.bodies, 1 / 255)))
+            trails.append(Trail(max_points=options.trail_length,
+                                min_angle=math.radians(options.trail_angle),
+                                min_distance=data.radius, color=bodies[-1].color))
+        for body in bodies[engine.pos.shape[0]:]:
+            body.visible = False
+        for trail, body in zip(trails, bodies):
+            trail.clear()
+            if body.visible:
+                trail.add(body.pos)
+        length = (values.distance + values.central.radius + values.sat.radius) / 2
+        for ptr, body in ((central_ptr, central), (sat_ptr, sat)):
+            ptr.axis = vp.vector(0, -length, 0)
+            ptr.pos = body.pos - ptr.axis + vp.vector(0, body.radius, 0)
+
+    # set up physics engine, canvas, bodies and pointers
+    timer = None
+    if profile or profile_log is not None:
+        timer = FrameTimer(log=profile_log)
+    engine = make_engine()
+    # number of finished recordings, which name the files of the following runs
+    recordings = 0
+    recorder = make_recorder()
+    worker = make_worker()
+    detector = make_detector()
+    checkpointer = None
+    if checkpoint is not None and worker is None:
+        # a worker process writes its own checkpoints
+        checkpointer = Checkpointer(checkpoint, interval=checkpoint_every, values=values)
     scene = vp.canvas(title="Simulation zum Zweikörperproblem", height=options.canvas.height,
                       width=options.canvas.width)
-    central = Body(name="central", mass=values.central.mass,
-                   velocity=vp.vector(values.central.velocity.x, values.central.velocity.y,
-                                      values.central.velocity.z), radius=values.central.radius,
-                   make_trail=True,
-                   color=vp.vector(options.colors.bodies.x / 255, options.colors.bodies.y / 255,
-                                   options.colors.bodies.z / 255))
-    sat = Body(name="sat", mass=values.sat.mass,
-               velocity=vp.vector(values.sat.velocity.x, values.sat.velocity.y,
-                                  values.sat.velocity.z),
-               pos=vp.vector(values.distance + values.central.radius + values.sat.radius, 0, 0),
-               radius=values.sat.radius, make_trail=True,
-               color=vp.vector(options.colors.bodies.x / 255, options.colors.bodies.y / 255,
-                               options.colors.bodies.z / 255))
-    central_ptr = vp.arrow(
-        axis=vp.vector(0, -((values.distance + central.radius + sat.radius) / 2), 0),
-        color=vp.vector(options.colors.pointers.x, options.colors.pointers.y,
-                        options.colors.pointers.z), visible=options.pointers)
-    central_ptr.pos = (central.pos - central_ptr.axis) + vp.vector(0, values.central.radius, 0)
-    sat_ptr = vp.arrow(axis=vp.vector(0, -((values.distance + central.radius + sat.radius) / 2), 0),
-                       color=vp.vector(options.colors.pointers.x, options.colors.pointers.y,
-                                       options.colors.pointers.z), visible=options.pointers)
-    sat_ptr.pos = sat.pos - sat_ptr.axis + vp.vector(0, values.sat.radius, 0)
+    central = Body(name="central", mass=values.central.mass, radius=values.central.radius,
+                   make_trail=False, color=to_vpython(options.colors.bodies, 1 / 255))
+    sat = Body(name="sat", mass=values.sat.mass, radius=values.sat.radius, make_trail=False,
+               color=to_vpython(options.colors.bodies, 1 / 255))
+    bodies = [central, sat]
+    trails = [Trail(max_points=options.trail_length, min_angle=math.radians(options.trail_angle),
+                    color=body.color) for body in bodies]
+    central_ptr = vp.arrow(color=to_vpython(options.colors.pointers), visible=options.pointers)
+    sat_ptr = vp.arrow(color=to_vpython(options.colors.pointers), visible=options.pointers)
+    place_bodies()
 
     # set up buttons
     pause_sim = vp.button(text="Play", bind=pause)
     vp.button(text="Stop", bind=lambda: os.kill(os.getpid(), signal.SIGINT))
-    vp.button(text="Restart", bind=restart)
+    vp.button(text="Restart", bind=lambda: restart())
     vp.checkbox(text="Collision detection", bind=switch_collision_detection, checked=True)
     scene.append_to_caption("\n")
 
-    # set up text fields for rate and Δt
+    # set up text fields for rate, Δt and steps per frame
     vp.wtext(text="Rate: ")
     vp.winput(text=options.rate, bind=change_rate)
     vp.wtext(text=" Δt: ")
     vp.winput(text=options.delta_t, bind=change_delta_t)
+    vp.wtext(text=" Steps per frame: ")
+    vp.winput(text=options.substeps, bind=change_substeps)
     scene.append_to_caption("\n")
 
     # set up sliders for changing the radius of the two bodies
@@ -119,34 +295,103 @@ def run_simulation(values: Values = Values(), options: Options = Options()):
                            value=1, top=12, bottom=12,
                            bind=lambda: adjust_radius(slider=sat_slider, sphere=sat))
     vp.button(text="Reset", bind=lambda: reset_slider(sat_slider))
+    if timer is not None:
+        scene.append_to_caption("\n")
+        profile_text = vp.wtext(text="")
+    if detector is not None:
+        scene.append_to_caption("\n")
+        event_text = vp.wtext(text="")
 
     # set up time variables
-    t = 0
+    drawn = 0
     t_max = options.rate * options.sim_time
     # main simulation loop
     if options.central_centered:
         scene.camera.follow(central)
-    while t <= t_max:
-        # weird behaviour of those two
-        vp.rate(options.rate)
-        # vp.sleep(1/options["update_rate"])
-        if pause_sim.text == "Pause":
-            # physical calculations
-            r = sat.pos - central.pos
-            fv = (6.67430e-11 * central.mass * sat.mass) / (vp.mag(r) ** 2)
-            central.force = fv * vp.norm(r)
-            sat.force = fv * vp.norm(-r)
-            central.calculate(options.delta_t)
-            sat.calculate(options.delta_t)
-            if options.pointers:
-                # move pointers
-                central_ptr.pos = central.pos - central_ptr.axis + vp.vector(0, central.radius, 0)
-                sat_ptr.pos = sat.pos - sat_ptr.axis + vp.vector(0, sat.radius, 0)
-            if options.sim_time > 0:
-                t += 1
-            # collision detection
-            if collision_detection and vp.mag(
-                    central.pos - sat.pos) < values.central.radius + values.sat.radius:
-                pause_sim.text = "Collision detected (original radii), click to continue"
-    if bool(options.restart):
-        restart()
+    # Stop and closing the window end the program with SystemExit from the SIGINT handler of
+    # vpython, and restarts never leave the loop, so the files are completed in any case
+    try:
+        while True:
+            if t > t_max:
+                if not options.restart:
+                    break
+                restart()
+            # weird behaviour of those two
+            vp.rate(options.rate)
+            # vp.sleep(1/options["update_rate"])
+            if pause_sim.text == "Pause":
+                if timer is not None:
+                    timer.lap("idle")
+                    steps, simulated = engine.steps, engine.t
+                if worker is not None:
+                    # draw the latest state published by the worker
+                    # the engine of this process only mirrors the state of the worker
+                    sequence, engine.t, engine.steps, stopped, _, _ = worker.read(engine.pos,
+                                                                                  engine.vel)
+                    if sequence == drawn:
+                        if timer is not None:
+                            timer.skip()
+                        continue
+                    drawn = sequence
+                    collided = stopped == COLLIDED
+                    failure = "the step size collapsed" if stopped == FAILED else None
+                else:
+                    failure = None
+                    try:
+                        if detector is not None:
+                            # physical calculations checking every step for events
+                            collided = detector.run(engine, options.steps_per_frame(),
+                                                    options.delta_t, collision_detection)
+                        else:
+                            # physical calculations, only the last state is drawn
+                            collided = engine.run(options.steps_per_frame(), options.delta_t,
+                                                  collision_detection)
+                    except FloatingPointError as error:
+                        # e.g. dopri5 on a near-radial pass without collision detection, the
+                        # engine keeps the state before the failed step
+                        collided = False
+                        failure = str(error)
+                if timer is not None:
+                    timer.lap("integration")
+                for body, trail, pos in zip(bodies, trails, engine.pos):
+                    body.show(pos)
+                    trail.add(body.pos)
+                if timer is not None:
+                    timer.lap("drawing")
+                if recorder is not None:
+                    recorder.record(engine)
+                if checkpointer is not None:
+                    checkpointer.update(engine, frames=t)
+                if timer is not None:
+                    timer.lap("recording")
+                if options.pointers:
+                    # move pointers
+                    central_ptr.pos = central.pos - central_ptr.axis \
+                        + vp.vector(0, central.radius, 0)
+                    sat_ptr.pos = sat.pos - sat_ptr.axis + vp.vector(0, sat.radius, 0)
+                if timer is not None:
+                    timer.lap("pointers")
+                    timer.end_frame(engine.steps - steps, engine.t - simulated)
+                    if timer.frames % max(int(options.rate), 1) == 0:
+                        # update the statistics about once per second
+                        profile_text.text = timer.text()
+                if options.sim_time > 0:
+                    t += 1
+                # collision detection
+                if collided:
+                    pause_sim.text = "Collision detected (original radii), click to continue"
+                elif failure is not None:
+                    pause_sim.text = "Calculation stopped ({}), click to continue".format(failure)
+            elif timer is not None:
+                timer.skip()
+    finally:
+        if worker is not None:
+            worker.stop()
+        if recorder is not None:
+            recorder.close()
+        if checkpointer is not None:
+            checkpointer.save(engine, frames=t)
+        if detector is not None:
+            detector.save(events)
+        if timer is not None:
+            timer.close()
@@ -0,0 +1,76 @@
+import math
+
+import vpython as vp
+
+
+class Trail:
+    """Orbit trail with a bounded number of points, drawn as a vpython curve
+
+    The last point of the trail follows the body. It is only kept, and a new point started, when
+    the body is far enough from the point before it and the trail bends by a visible angle
+    against the direction the segment started in. Both are measured from the last kept point,
+    so slow bodies get new points as well. The oldest points are dropped when the trail is full.
+
+    Attributes:
+    curve: The vpython curve showing the trail
+    max_points: Maximum number of points (0 for unlimited)
+    min_angle: Minimum bend in radians for a new point (0 to keep every point)
+    min_distance: Minimum distance in m between points
+    """
+
+    def __init__(self, max_points=2000, min_angle=math.radians(1.0), min_distance=0.0, **kwargs):
+        """Initialize a Trail, the other keyword arguments are passed to vpython.curve"""
+        self.curve = vp.curve(**kwargs)
+        self.max_points = max_points
+        self.min_angle = min_angle
+        self.min_distance = min_distance
+        self._last = None
+        self._previous = None
+        self._direction = None
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, pos: vp.vector):
+        """Add a position to the end of the trail"""
+        pos = vp.vector(pos)
+        if self._last is None:
+            self._append(pos)
+            return
+        if vp.mag(pos - self._last) == 0:
+            return
+        if self._previous is None:
+            self._start_segment(pos)
+            return
+        chord = pos - self._previous
+        if vp.mag(chord) < self.min_distance or (
+                vp.diff_angle(self._direction, chord) < self.min_angle):
+            # no visible curvature since the last kept point, move the last point instead
+            self.curve.modify(self._count - 1, pos=pos)
+            self._last = pos
+            return
+        self._start_segment(pos)
+
+    def _start_segment(self, pos):
+        """Keep the last point and start a new segment from it to pos"""
+        self._previous = self._last
+        self._direction = pos - self._last
+        self._append(pos)
+
+    def _append(self, pos):
+        """Append a point to the curve, dropping the oldest one if the trail is full"""
+        if self.max_points and self._count >= self.max_points:
+            self.curve.shift()
+        else:
+            self._count += 1
+        self.curve.append(pos)
+        self._last = pos
+
+    def clear(self):
+        """Remove all points of the trail"""
+        self.curve.clear()
+        self._last = None
+        self._previous = None
+        self._direction = None
+        self._count = 0
@@ -0,0 +1,220 @@
+"""Physics in a separate process
+
+The worker process owns the Engine and steps it at a given pace, independent of the renderer. After
+every batch of steps it publishes time, step count and the positions and velocities of all bodies
+into a double buffer in shared memory, which the renderer copies from without pickling.
+Settings like Δt or the pace reach the worker as small messages through a queue.
+"""
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from twobodyproblem.checkpoint import Checkpointer
+from twobodyproblem.engine import Engine
+
+# numbers before the positions and velocities in a slot: sequence number, t, steps, stopped
+_HEADER = 4
+# reasons why the worker paused itself, published as stopped
+COLLIDED = 1
+FAILED = 2
+# longest time in s between two publications of the worker
+_PUBLISH_INTERVAL = 0.02
+
+
+class SharedState:
+    """Double buffer for the latest state of N bodies in shared memory
+
+    The first number is the index of the slot written last. The writer always fills the other
+    slot and then switches the index. While it writes a slot, the sequence number of the slot is
+    -1, so a reader that copied a slot overwritten in the meantime sees a changed sequence number
+    and reads again (a sequence lock).
+
+    Attributes:
+    name: Name of the shared memory block
+    n_bodies: Number of bodies
+    """
+
+    def __init__(self, n_bodies, name=None):
+        """Create a new shared memory block, or attach to the block name of another process"""
+        self.n_bodies = n_bodies
+        self._slot_size = _HEADER + 6 * n_bodies
+        size = (1 + 2 * self._slot_size) * 8
+        self._owner = name is None
+        self._memory = shared_memory.SharedMemory(name=name, create=self._owner, size=size)
+        self.name = self._memory.name
+        self._data = np.ndarray(1 + 2 * self._slot_size, dtype=float, buffer=self._memory.buf)
+        if self._owner:
+            self._data[:] = 0.0
+        self._slots = []
+        for i in range(2):
+            start = 1 + i * self._slot_size
+            self._slots.append((
+                self._data[start:start + _HEADER],
+                self._data[start + _HEADER:start + _HEADER + 3 * n_bodies].reshape(n_bodies, 3),
+                self._data[start + _HEADER + 3 * n_bodies:start + self._slot_size].reshape(
+                    n_bodies, 3)))
+        self._sequence = int(max(header[0] for header, _, _ in self._slots))
+
+    def write(self, t, steps, stopped, pos, vel):
+        """Publish a new state, stopped is 0, COLLIDED or FAILED"""
+        slot = 1 - int(self._data[0])
+        header, slot_pos, slot_vel = self._slots[slot]
+        header[0] = -1
+        slot_pos[:] = pos
+        slot_vel[:] = vel
+        header[1] = t
+        header[2] = steps
+        header[3] = stopped
+        self._sequence += 1
+        header[0] = self._sequence
+        self._data[0] = slot
+
+    def read(self, pos=None, vel=None):
+        """Return sequence number, t, steps, stopped and copies of positions and velocities
+
+        Arguments:
+        pos, vel: arrays of shape (N, 3) to copy the positions and velocities to (default new)
+        """
+        if pos is None:
+            pos = np.empty((self.n_bodies, 3))
+        if vel is None:
+            vel = np.empty((self.n_bodies, 3))
+        while True:
+            header, slot_pos, slot_vel = self._slots[int(self._data[0])]
+            sequence = header[0]
+            if sequence < 0:
+                # the writer is already filling the newest slot again
+                continue
+            t, steps, stopped = header[1:4]
+            pos[:] = slot_pos
+            vel[:] = slot_vel
+            if header[0] == sequence:
+                return int(sequence), float(t), int(steps), int(stopped), pos, vel
+
+    def close(self):
+        """Detach from the shared memory and remove it if this object created it"""
+        self._data = None
+        self._slots = []
+        try:
+            self._memory.close()
+        except BufferError:
+            # arrays of the block are still referenced, the mapping is released with the last one
+            pass
+        if self._owner:
+            self._memory.unlink()
+
+
+def _work(name, engine, control, delta_t, steps_per_second, collision_detection, checkpoint,
+          checkpoint_every, values):
+    """Main loop of the worker process, runs until it receives stop"""
+    state = SharedState(engine.pos.shape[0], name=name)
+    checkpointer = None
+    if checkpoint is not None:
+        checkpointer = Checkpointer(checkpoint, interval=checkpoint_every, values=values)
+    paused = True
+    start = time.perf_counter()
+    done = 0
+    try:
+        while True:
+            try:
+                # wait for messages while paused, only look for them while running
+                message, value = control.get(block=paused, timeout=0.1 if paused else None)
+            except queue.Empty:
+                message = None
+            if message == "stop":
+                break
+            if message == "pause":
+                paused = bool(value)
+            elif message == "delta_t":
+                delta_t = value
+            elif message == "steps_per_second":
+                steps_per_second = value
+            elif message == "collision_detection":
+                collision_detection = bool(value)
+            if message is not None:
+                # restart the pace after every change
+                start = time.perf_counter()
+                done = 0
+                continue
+            if paused:
+                continue
+            due = int((time.perf_counter() - start) * steps_per_second) - done
+            if due <= 0:
+                time.sleep(min((1 - due) / steps_per_second, _PUBLISH_INTERVAL))
+                continue
+            due = min(due, max(1, int(steps_per_second * _PUBLISH_INTERVAL)))
+            try:
+                stopped = COLLIDED if engine.run(due, delta_t, collision_detection) else 0
+            except FloatingPointError:
+                # the step size of an adaptive integrator collapsed, the engine keeps the state
+                # before the failed step
+                stopped = FAILED
+            done += due
+            state.write(engine.t, engine.steps, stopped, engine.pos, engine.vel)
+            if stopped:
+                paused = True
+            if checkpointer is not None:
+                checkpointer.update(engine)
+    finally:
+        if checkpointer is not None:
+            checkpointer.save(engine)
+        state.close()
+
+
+class PhysicsWorker:
+    """Runs an Engine in a worker process that starts paused
+
+    Attributes:
+    state: SharedState with the latest state published by the worker
+    """
+
+    def __init__(self, engine: Engine, delta_t=10, steps_per_second=100, collision_detection=True,
+                 checkpoint=None, checkpoint_every=5.0, values=None):
+        """Initialize a PhysicsWorker and start its process
+
+        Arguments:
+        engine: Engine to run, it is copied to the worker
+        delta_t: Δt value (seconds in one calculation) (default 10)
+        steps_per_second: pace of the worker in calculations per second (default 100)
+        collision_detection: pause at the first contact of the bodies (default True)
+        checkpoint: path of a checkpoint file written by the worker (default None)
+        checkpoint_every: wall time in s between two checkpoints (default 5.0)
+        values: Values object stored in the checkpoints (default None)
+        """
+        self.state = SharedState(engine.pos.shape[0])
+        self.state.write(engine.t, engine.steps, 0, engine.pos, engine.vel)
+        context = multiprocessing.get_context("spawn")
+        self._control = context.Queue()
+        self._process = context.Process(
+            target=_work, daemon=True,
+            args=(self.state.name, engine, self._control, delta_t, steps_per_second,
+                  collision_detection, checkpoint, checkpoint_every, values))
+        self._process.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def send(self, message, value=None):
+        """Send a message (pause, delta_t, steps_per_second, collision_detection) to the worker"""
+        self._control.put((message, value))
+
+    def read(self, pos=None, vel=None):
+        """Return the latest published state, see SharedState.read"""
+        return self.state.read(pos, vel)
+
+    def stop(self, timeout=5.0):
+        """Stop the worker process and release the shared memory"""
+        if self._process.is_alive():
+            self.send("stop")
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+        if self.state is not None:
+            self.state.close()
+            self.state = None
@@ -0,0 +1,17 @@
+"""Reading and writing of the YAML files, using the C version of libyaml if it is installed"""
+import yaml
+
+try:
+    from yaml import CSafeDumper as Dumper, CSafeLoader as Loader
+except ImportError:
+    from yaml import SafeDumper as Dumper, SafeLoader as Loader
+
+
+def load(stream):
+    """Return the data of a YAML document from a string or an open file"""
+    return yaml.load(stream, Loader=Loader)
+
+
+def dump(data) -> str:
+    """Return data as a YAML document"""
+    return yaml.dump(data, Dumper=Dumper)